@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+"""Synthetic vendor files for benchmarks
+
+Each function writes a file in the format of one vendor's export, of any
+size, from a seeded random generator (so the same arguments always give the
+same file).  The formats follow the sample files in ``tests/data``.
+"""
+
+import random
+
+
+def student(i):
+    "return (Fullname, Username, Student ID, Email) of synthetic student `i`"
+    username = 'u%d' % i
+    return ('Last%d, First%d' % (i, i), username, 'N%08d' % i,
+            username + '@nyu.edu')
+
+
+def webassign_gradebook(path, n_students, n_homeworks=10, seed=0):
+    "write a WebAssign GradeBook (tab-delimited text) to `path`"
+    rng = random.Random(seed)
+    homeworks = ['Homework %d' % (j + 1) for j in range(n_homeworks)]
+    with open(path, 'w') as f:
+        f.write('Calculus I, Section 001, Spring 2017\n')
+        f.write('Matthew Leingang\n')
+        f.write('Friday, February 24, 2017 10:15 AM EST\n')
+        f.write('\n')
+        f.write('\t'.join(['Assignment Category', '', '', '',
+                           'Homework [%d]' % n_homeworks, 'Quiz [1]',
+                           'Test [1]', 'Final'] + homeworks) + '\n')
+        f.write('\t'.join(['Weight', '', '', '', '20 [2]', '10', '70',
+                           '100']) + '\n')
+        f.write('\n')
+        f.write('Fullname\tUsername\tStudent ID\tEmail\t\n')
+        for i in range(n_students):
+            (fullname, username, sid, email) = student(i)
+            if i % 10 == 1:
+                # matched to NYU Classes by email only
+                username = 'wa%d' % i
+            scores = [rng.randint(0, 100) for j in range(n_homeworks)]
+            homework = sum(scores) / n_homeworks
+            quiz = rng.choice([0, 50, 100])
+            test = rng.randint(40, 100)
+            final = 0.2 * homework + 0.1 * quiz + 0.7 * test
+            f.write('\t'.join(
+                [fullname, username, sid, email] +
+                ['%.1f' % homework, str(quiz), str(test), '%.1f' % final] +
+                [str(score) for score in scores]) + '\n')
+
+
+def nyuclasses_gradebook(path, n_students, seed=0):
+    """write an NYU Classes gradebook (CSV) to `path`
+
+    Most students match a WebAssign Username; in each ten, one matches only
+    by name and one only by email; in each hundred, one doesn't match.
+    """
+    rng = random.Random(seed)
+    order = list(range(n_students))
+    rng.shuffle(order)
+    with open(path, 'w') as f:
+        f.write('Student ID,Student Name,Homework 1\n')
+        for i in order:
+            (fullname, username, sid, email) = student(i)
+            if i % 100 == 99:
+                (username, fullname) = ('x%d' % i, 'Nobody%d, Nemo' % i)
+            elif i % 10 == 0:
+                username = 'n%d' % i
+            elif i % 10 == 1:
+                fullname = 'Other%d, Name' % i
+            f.write('%s,"%s",\n' % (username, fullname))
+
+
+def gradescope_scores(path, n_students, max_points=20, seed=0):
+    "write a Gradescope scores file (CSV) to `path`"
+    rng = random.Random(seed)
+    with open(path, 'w') as f:
+        f.write('Name,SID,Email,Total Score,Max Points,Status\n')
+        for i in range(n_students):
+            (fullname, username, sid, email) = student(i)
+            if rng.random() < 0.05:
+                f.write('First%d Last%d,%s,%s,,%.1f,Missing\n'
+                        % (i, i, username, email, max_points))
+            else:
+                f.write('First%d Last%d,%s,%s,%.1f,%.1f,Graded\n'
+                        % (i, i, username, email,
+                           rng.randint(0, 2 * max_points) / 2, max_points))
+
+
+CLASSVIEW_HEAD = '''<html>
+<head>
+<title>WebAssign - Class View</title>
+<script type="text/javascript">
+  var rows = "<table><tr><td>not an assignment</td></tr></table>";
+</script>
+</head>
+<body>
+<div id="wa">
+<table>
+<tbody>
+<tr><td>WebAssign</td></tr>
+<tr><td>Calculus I, Section 001, Spring 2017</td></tr>
+<tr>
+<td>menu</td>
+<td>
+<div>Current Assignments</div>
+<div>
+<table>
+<tbody>
+<tr><th colspan="4">Current Assignments</th></tr>
+'''
+
+CLASSVIEW_ROW = '''<tr>
+<td><font><b>%s</b></font></td>
+<td>--</td>
+<td>0/100</td>
+<td><font>%s<br>%s</font></td>
+</tr>
+'''
+
+CLASSVIEW_TAIL = '''</tbody>
+</table>
+</div>
+</td>
+</tr>
+</tbody>
+</table>
+</div>
+</body>
+</html>
+'''
+
+
+def classview_page(path, n_assignments, seed=0):
+    "write a WebAssign ClassView HTML page to `path`"
+    rng = random.Random(seed)
+    with open(path, 'w') as f:
+        f.write(CLASSVIEW_HEAD)
+        for j in range(n_assignments):
+            (month, day) = (rng.randint(1, 12), rng.randint(1, 21))
+            zone = 'EDT' if 3 < month < 11 else 'EST'
+            f.write(CLASSVIEW_ROW % (
+                'Homework %d' % (j + 1),
+                '%d-%d-17 05:00 PM %s' % (month, day, zone),
+                '%d-%d-17 11:59 PM %s' % (month, day + 7, zone)))
+        f.write(CLASSVIEW_TAIL)
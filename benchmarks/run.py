@@ -0,0 +1,137 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Benchmarks of the vendor file parsers and converters
+
+Run ``python -m benchmarks.run`` from the top of the repository.  Each
+benchmark runs on synthetic files (see :mod:`benchmarks.generators`) of
+each size, and its best time of several runs is reported.  With
+``--save``, the times are stored as the baseline; later runs compare
+against it and exit with an error if anything got slower by more than the
+tolerance.
+"""
+
+import json
+import logging
+import os
+import tempfile
+import time
+
+import click
+
+from benchmarks import generators
+
+BASELINE = os.path.join(os.path.dirname(__file__), 'baseline.json')
+
+
+def bench_wagb_parse(tmpdir, size):
+    "WagbParser.parse on a GradeBook of `size` students"
+    from nyucutils.vendors import webassign
+    path = os.path.join(tmpdir, 'gradebook.txt')
+    generators.webassign_gradebook(path, size)
+    return lambda: webassign.WagbParser(path).parse()
+
+
+def bench_nyucgb_grades(tmpdir, size):
+    "NyucgbDecorator.grades merging rosters of `size` students"
+    from nyucutils.vendors import webassign
+    wagb_path = os.path.join(tmpdir, 'gradebook.txt')
+    nyucgb_path = os.path.join(tmpdir, 'gradebook.csv')
+    generators.webassign_gradebook(wagb_path, size)
+    generators.nyuclasses_gradebook(nyucgb_path, size)
+    wagb = webassign.WagbParser(wagb_path).parse()
+    nyucgb = webassign.NyucgbParser(nyucgb_path).parse()
+    return lambda: webassign.NyucgbDecorator(nyucgb, wagb).grades
+
+
+def bench_assignments_from_html(tmpdir, size):
+    "assignments_from_html on a ClassView page of `size` assignments"
+    from nyucutils.vendors import webassign
+    path = os.path.join(tmpdir, 'classview.html')
+    generators.classview_page(path, size)
+    return lambda: webassign.assignments_from_html(path)
+
+
+def bench_gs2nyuc(tmpdir, size):
+    "gs2nyuc end to end on a scores file of `size` students"
+    from nyucutils.vendors import gradescope
+    path = os.path.join(tmpdir, 'Homework_1_scores.csv')
+    output = os.path.join(tmpdir, 'Homework_1_scores.nyucgb.csv')
+    generators.gradescope_scores(path, size)
+    return lambda: gradescope.gs2nyuc.main(
+        [path, '20', '-o', output], standalone_mode=False)
+
+
+BENCHMARKS = {
+    'wagb_parse': bench_wagb_parse,
+    'nyucgb_grades': bench_nyucgb_grades,
+    'assignments_from_html': bench_assignments_from_html,
+    'gs2nyuc': bench_gs2nyuc,
+}
+
+
+def best_time(f, repeat):
+    "return the least wall time of `repeat` calls of `f`"
+    times = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        f()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+@click.command()
+@click.option('-s', '--sizes', default='100,1000,10000',
+              help='comma-separated numbers of students or assignments')
+@click.option('-b', '--benchmark', 'names', multiple=True,
+              type=click.Choice(sorted(BENCHMARKS)),
+              help='run only this benchmark (may be repeated)')
+@click.option('-r', '--repeat', type=int, default=3,
+              help='runs of each benchmark; the best time counts')
+@click.option('--baseline', type=click.Path(dir_okay=False), default=BASELINE,
+              help='baseline file to compare with or save to')
+@click.option('--save', is_flag=True, default=False,
+              help='save the times as the new baseline')
+@click.option('-t', '--tolerance', type=float, default=0.25,
+              help='slowdown over the baseline counted as a regression')
+def main(sizes, names, repeat, baseline, save, tolerance):
+    """Time the parsers and converters on synthetic files
+
+    Sizes can go up to 1000000; the largest take minutes and a few GB.
+    """
+    # unmatched students are expected; don't time their warnings
+    logging.basicConfig(level=logging.ERROR)
+    sizes = [int(size) for size in sizes.split(',')]
+    names = names or sorted(BENCHMARKS)
+    try:
+        with open(baseline) as f:
+            previous = json.load(f)
+    except FileNotFoundError:
+        previous = {}
+    results = {}
+    regressions = 0
+    click.echo("%-24s %10s %12s %12s" % ('benchmark', 'size', 'time (s)', 'baseline'))
+    for name in names:
+        results[name] = {}
+        for size in sizes:
+            with tempfile.TemporaryDirectory() as tmpdir:
+                seconds = best_time(BENCHMARKS[name](tmpdir, size), repeat)
+            results[name][str(size)] = seconds
+            before = previous.get(name, {}).get(str(size))
+            flag = ''
+            if before is not None and seconds > before * (1 + tolerance):
+                flag = ' REGRESSION'
+                regressions += 1
+            click.echo("%-24s %10d %12.4f %12s%s" % (
+                name, size, seconds,
+                '-' if before is None else '%.4f' % before, flag))
+    if save:
+        for (name, times) in results.items():
+            previous.setdefault(name, {}).update(times)
+        with open(baseline, 'w') as f:
+            json.dump(previous, f, indent=2, sort_keys=True)
+    elif regressions:
+        raise click.ClickException("%d regressions" % regressions)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+"""On-disk cache of parsed gradebooks
+
+Parsed gradebooks are stored under a key made from the SHA-256 hash of the
+input file's contents and the parser's class name and ``cache_version``,
+so an edited file, or a changed parser, is a cache miss.  The gradebooks
+(pandas frames and metadata) are stored as binary pickles.  When the cache
+grows beyond its size limit, the least recently used entries are removed.
+"""
+
+import hashlib
+import logging
+import os
+import pickle
+import tempfile
+
+
+def file_digest(path, blocksize=1 << 20):
+    "return the SHA-256 hex digest of the contents of the file at `path`"
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(blocksize), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ParseCache(object):
+    """A size-bounded LRU cache of parsed gradebooks in `directory`
+
+    The default directory is ``$NYUCUTILS_CACHE_DIR``, or else
+    ``~/.cache/nyucutils``.
+    """
+
+    max_bytes = 256 * 1024 * 1024
+    suffix = '.pickle'
+
+    def __init__(self, directory=None, max_bytes=None):
+        if directory is None:
+            directory = os.environ.get(
+                'NYUCUTILS_CACHE_DIR',
+                os.path.join(os.path.expanduser('~'), '.cache', 'nyucutils'))
+        self.directory = directory
+        if max_bytes is not None:
+            self.max_bytes = max_bytes
+
+    def key(self, parser):
+        "return the cache key for `parser`'s file"
+        return '%s-%s-%s' % (type(parser).__name__,
+                             getattr(parser, 'cache_version', 0),
+                             file_digest(parser.file))
+
+    def path(self, key):
+        return os.path.join(self.directory, key + self.suffix)
+
+    def get(self, key):
+        """return the object stored under `key`, or None
+
+        Unreadable entries, including pickles of classes that have since
+        moved or changed, count as misses.
+        """
+        path = self.path(key)
+        try:
+            with open(path, 'rb') as f:
+                obj = pickle.load(f)
+            # mark as recently used
+            os.utime(path)
+        except (OSError, EOFError, pickle.UnpicklingError,
+                AttributeError, ImportError):
+            return None
+        return obj
+
+    def put(self, key, obj):
+        "store `obj` under `key`, then evict entries to fit the size limit"
+        os.makedirs(self.directory, exist_ok=True)
+        (fd, tmp) = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump(obj, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, self.path(key))
+        self.evict()
+
+    def evict(self):
+        """remove least recently used entries until the cache fits
+
+        Other threads or processes may be evicting at the same time, so
+        entries may vanish from under us.
+        """
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith(self.suffix):
+                try:
+                    stat = os.stat(os.path.join(self.directory, name))
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, name))
+        total = sum(size for (mtime, size, name) in entries)
+        for (mtime, size, name) in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            logging.getLogger('ParseCache').debug("evicting %s", name)
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def parse(self, parser):
+        """return ``parser.parse()``, from the cache if possible
+
+        Parsers reading file-like objects rather than paths aren't cached.
+        """
+        if hasattr(parser.file, 'read'):
+            return parser.parse()
+        key = self.key(parser)
+        result = self.get(key)
+        if result is None:
+            result = parser.parse()
+            self.put(key, result)
+        else:
+            logging.getLogger('ParseCache').info(
+                "%s: using cached parse", parser.file)
+        return result
@@ -1,14 +1,61 @@
 # -*- coding: utf-8 -*-
 
+import importlib
+
 import click
 
 
-@click.command()
+class LazyGroup(click.Group):
+    """click Group whose subcommands are imported only when used
+
+    `lazy_commands` maps command names to pairs (import path, short help),
+    where the import path looks like ``package.module:command``.  The short
+    help is kept here so that listing the commands imports nothing; in
+    particular, pandas is only imported by the subcommands that need it.
+    """
+
+    def __init__(self, *args, lazy_commands=None, **kwds):
+        super().__init__(*args, **kwds)
+        self.lazy_commands = lazy_commands or {}
+
+    def list_commands(self, ctx):
+        return sorted(set(super().list_commands(ctx)) | set(self.lazy_commands))
+
+    def get_command(self, ctx, name):
+        if name in self.lazy_commands:
+            (module_name, attr) = self.lazy_commands[name][0].split(':')
+            return getattr(importlib.import_module(module_name), attr)
+        return super().get_command(ctx, name)
+
+    def format_commands(self, ctx, formatter):
+        "like click.Group.format_commands, but without importing anything"
+        rows = []
+        for name in self.list_commands(ctx):
+            if name in self.lazy_commands:
+                rows.append((name, self.lazy_commands[name][1]))
+            else:
+                rows.append((name, self.get_command(ctx, name).get_short_help_str()))
+        if rows:
+            with formatter.section('Commands'):
+                formatter.write_dl(rows)
+
+
+@click.group(cls=LazyGroup, lazy_commands={
+    'wacv2csv': ('nyucutils.vendors.webassign:assignments_from_html_to_csv',
+                 'Extract assignments from WebAssign ClassView pages.'),
+    'wa2nyuc': ('nyucutils.vendors.webassign:wagb_to_nyucgb',
+                'Merge a WebAssign GradeBook with an NYU Classes Gradebook.'),
+    'wa2nyuc-batch': ('nyucutils.vendors.webassign:wagb_to_nyucgb_batch',
+                      'Merge many WebAssign GradeBooks with NYU Classes Gradebooks.'),
+    'nyuc2gs': ('nyucutils.vendors.gradescope:munge',
+                'Convert NYU Classes Gradebooks to a Gradescope roster.'),
+    'gs2nyuc': ('nyucutils.vendors.gradescope:gs2nyuc',
+                'Convert a Gradescope gradebook to an NYU Classes gradebook.'),
+    'gs2nyuc-merge': ('nyucutils.vendors.gradescope:gs2nyuc_merge',
+                      'Merge Gradescope gradebooks into one NYU Classes gradebook.'),
+})
 def main(args=None):
     """Console script for nyucutils"""
-    click.echo("Replace this message by putting your code into "
-               "nyucutils.cli.main")
-    click.echo("See click documentation at http://click.pocoo.org/")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+"""Concurrent loading of input files
+
+On network-mounted file systems most of a command's wall time can be
+spent waiting on reads.  The coroutines here overlap that waiting with
+asyncio: each input file is read into memory in its own I/O thread and
+parsed in an executor as soon as its contents arrive.  The synchronous
+wrapper :func:`load_files` runs them from ordinary code, even code
+already running in an event loop (e.g., a notebook), and
+:func:`call_all` runs any callables concurrently in threads.
+"""
+
+import asyncio
+import concurrent.futures
+import io
+
+
+def read_file(path):
+    "return the contents of the file at `path` as a named binary buffer"
+    with open(path, 'rb') as f:
+        buffer = io.BytesIO(f.read())
+    # like an open file, so that parsers can report the file name
+    buffer.name = path
+    return buffer
+
+
+async def load(path, parse, io_executor=None, executor=None):
+    """read the file at `path` in `io_executor`, then return
+    ``parse(buffer)`` computed in `executor`
+
+    `buffer` is a binary file object holding the contents of the file, with
+    the path as its ``name``.  None means the event loop's default
+    (thread pool) executor.
+    """
+    loop = asyncio.get_running_loop()
+    buffer = await loop.run_in_executor(io_executor, read_file, path)
+    return await loop.run_in_executor(executor, parse, buffer)
+
+
+async def load_all(jobs, executor=None):
+    """load the (path, parse) pairs `jobs` concurrently, as by :func:`load`,
+    and return the parse results in the same order"""
+    jobs = list(jobs)
+    with concurrent.futures.ThreadPoolExecutor(
+            max_workers=max(len(jobs), 1)) as io_executor:
+        return await asyncio.gather(
+            *[load(path, parse, io_executor, executor)
+              for (path, parse) in jobs])
+
+
+def run(coroutine):
+    """run `coroutine` to completion and return its result
+
+    Inside a running event loop, where :func:`asyncio.run` can't be used,
+    the coroutine is run in a new event loop in another thread.
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coroutine)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=1) as thread:
+        return thread.submit(asyncio.run, coroutine).result()
+
+
+def load_files(jobs, executor=None):
+    """return the results of parsing the (path, parse) pairs `jobs`
+
+    The files are read concurrently and each is parsed as soon as it has
+    been read; see :func:`load`.
+    """
+    return run(load_all(jobs, executor))
+
+
+def call_all(calls):
+    """return the results of the callables `calls`, run concurrently in
+    threads (no event loop is needed for that)"""
+    calls = list(calls)
+    with concurrent.futures.ThreadPoolExecutor(
+            max_workers=max(len(calls), 1)) as executor:
+        futures = [executor.submit(call) for call in calls]
+        return [future.result() for future in futures]
+
@@ -1,7 +1,13 @@
 # -*- coding: utf-8 -*-
 
+from contextlib import contextmanager
 from functools import wraps
+import json
 import logging
+import threading
+import time
+
+import click
 
 def log_begin(f):
     """log the beginning of a function
@@ -20,9 +26,12 @@ def log_begin(f):
     INFO:f:begin
     4
     """
+    log = logging.getLogger(f.__name__)
+
     @wraps(f)
     def wrapper(*args, **kwds):
-        logging.getLogger(f.__name__).info("begin")
+        if log.isEnabledFor(logging.INFO):
+            log.info("begin")
         return f(*args, **kwds)
     return wrapper
 
@@ -39,16 +48,49 @@ def log_end(f):
     INFO:g:end
     8
     """
+    log = logging.getLogger(f.__name__)
+
     @wraps(f)
     def wrapper(*args, **kwds):
         res = f(*args, **kwds)
-        logging.getLogger(f.__name__).info("end")
+        if log.isEnabledFor(logging.INFO):
+            log.info("end")
         return res
     return wrapper
 
+def summarize(obj, width=200):
+    """return a short description of `obj` for logging
+
+    Objects with a shape (DataFrames, Series, arrays) are described by their
+    type, shape, and dtypes; anything else by its repr, truncated to `width`
+    characters.
+
+    >>> summarize(9)
+    '9'
+    >>> summarize(list(range(100)), width=20)
+    '[0, 1, 2, 3, 4, 5...'
+    """
+    shape = getattr(obj, 'shape', None)
+    if shape is not None:
+        dtypes = getattr(obj, 'dtypes', None)
+        if dtypes is not None and hasattr(dtypes, 'value_counts'):
+            counts = dtypes.astype(str).value_counts()
+            dtypes = ', '.join('%s: %d' % item for item in counts.items())
+        else:
+            dtypes = getattr(obj, 'dtype', None)
+        return '<%s shape=%s dtypes=%s>' % (type(obj).__name__, shape, dtypes)
+    text = repr(obj)
+    if len(text) > width:
+        text = text[:width - 3] + '...'
+    return text
+
+
 def log_result(f):
     """log the result of a function
 
+    Large results are summarized (see :func:`summarize`), and nothing is
+    computed unless INFO messages are enabled.
+
     >>> @log_result
     ... def f(x):
     ...     return x*x
@@ -69,9 +111,185 @@ def log_result(f):
     INFO:f:end
     9
     """
+    log = logging.getLogger(f.__name__)
+
     @wraps(f)
     def wrapper(*args, **kwds):
         res = f(*args, **kwds)
-        logging.getLogger(f.__name__).info("result: %s",repr(res))
+        if log.isEnabledFor(logging.INFO):
+            log.info("result: %s", summarize(res))
         return res
     return wrapper
+
+
+class Profiler(object):
+    """Collects the number of calls and the wall and CPU time of stages
+
+    Timing only happens while the profiler is enabled, so the timing
+    decorators cost next to nothing otherwise.
+
+    >>> p = Profiler()
+    >>> p.record('parse', 0.5, 0.25)
+    >>> p.record('parse', 0.5, 0.25)
+    >>> p.report()
+    {'parse': {'calls': 2, 'wall': 1.0, 'cpu': 0.5}}
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.stats = {}
+        # stages may be timed in several threads at once (see pipeline)
+        self.lock = threading.Lock()
+
+    def record(self, stage, wall, cpu):
+        "record one call of `stage` taking `wall` and `cpu` seconds"
+        with self.lock:
+            stats = self.stats.setdefault(stage, [0, 0.0, 0.0])
+            stats[0] += 1
+            stats[1] += wall
+            stats[2] += cpu
+
+    def merge(self, report):
+        "add the stats of `report`, as returned by :meth:`report`"
+        with self.lock:
+            for (stage, stats) in report.items():
+                totals = self.stats.setdefault(stage, [0, 0.0, 0.0])
+                totals[0] += stats['calls']
+                totals[1] += stats['wall']
+                totals[2] += stats['cpu']
+
+    def reset(self):
+        self.stats = {}
+
+    def report(self):
+        "return a dict of the stats of each stage"
+        return dict((stage, {'calls': calls, 'wall': wall, 'cpu': cpu})
+                    for (stage, (calls, wall, cpu)) in self.stats.items())
+
+    def format_report(self):
+        "return the report as a table, slowest stage first"
+        lines = ["%-24s %8s %10s %10s" % ('stage', 'calls', 'wall (s)', 'cpu (s)')]
+        for (stage, (calls, wall, cpu)) in sorted(
+                self.stats.items(), key=lambda item: -item[1][1]):
+            lines.append("%-24s %8d %10.4f %10.4f" % (stage, calls, wall, cpu))
+        return '\n'.join(lines)
+
+
+profiler = Profiler()
+
+
+def profiled_call(enabled, f, *args, **kwds):
+    """return ``(f(*args, **kwds), report)``, where `report` is the profiler
+    report of the call if `enabled`, and None otherwise
+
+    Worker processes don't share the profiler of the parent process, so
+    jobs sent to them are wrapped in this (pass ``profiler.enabled``), and
+    the parent merges the reports with :meth:`Profiler.merge`.
+
+    >>> profiled_call(True, sorted, [2, 1])
+    ([1, 2], {})
+    """
+    if not enabled:
+        return (f(*args, **kwds), None)
+    (was_enabled, stats) = (profiler.enabled, profiler.stats)
+    profiler.stats = {}
+    profiler.enabled = True
+    try:
+        result = f(*args, **kwds)
+        return (result, profiler.report())
+    finally:
+        (profiler.enabled, profiler.stats) = (was_enabled, stats)
+
+
+@contextmanager
+def timed(stage):
+    """time the body of a `with` statement as `stage` in the profiler
+
+    >>> profiler.enabled = True
+    >>> with timed('write'):
+    ...     pass
+    >>> profiler.report()['write']['calls']
+    1
+    >>> profiler.enabled = False
+    >>> profiler.reset()
+    """
+    if not profiler.enabled:
+        yield
+        return
+    (wall, cpu) = (time.perf_counter(), time.process_time())
+    try:
+        yield
+    finally:
+        profiler.record(stage, time.perf_counter() - wall,
+                        time.process_time() - cpu)
+
+
+def log_time(stage=None):
+    """log and profile the time of a function, as `stage`
+
+    Like the other log decorators, but with an argument: the name of the
+    stage, by default the function's qualified name.  Nothing is timed
+    unless the profiler is enabled.
+
+    >>> @log_time('square')
+    ... def f(x):
+    ...     return x*x
+    ...
+    >>> profiler.enabled = True
+    >>> f(3)
+    9
+    >>> profiler.report()['square']['calls']
+    1
+    >>> profiler.enabled = False
+    >>> profiler.reset()
+    """
+    def decorator(f):
+        name = stage or f.__qualname__
+        log = logging.getLogger(f.__name__)
+
+        @wraps(f)
+        def wrapper(*args, **kwds):
+            if not profiler.enabled:
+                return f(*args, **kwds)
+            (wall, cpu) = (time.perf_counter(), time.process_time())
+            try:
+                return f(*args, **kwds)
+            finally:
+                (wall, cpu) = (time.perf_counter() - wall,
+                               time.process_time() - cpu)
+                profiler.record(name, wall, cpu)
+                log.info("time: %.4fs wall, %.4fs cpu", wall, cpu)
+        return wrapper
+    return decorator
+
+
+def profile_options(f):
+    """add --profile and --profile-json options to a click command
+
+    With either option, the profiler is enabled while the command runs.
+    --profile prints the report to stderr; --profile-json writes it to a
+    file as JSON.  Commands running jobs in worker processes wrap them in
+    :func:`profiled_call` and merge the jobs' reports.  Put this decorator
+    below :func:`click.command`.
+    """
+    @click.option('--profile-json', type=click.File('w'), default=None,
+                  help='write a JSON timing report to this file')
+    @click.option('--profile', is_flag=True, default=False,
+                  help='print a timing report to stderr')
+    @wraps(f)
+    def wrapper(*args, profile=False, profile_json=None, **kwds):
+        if not (profile or profile_json):
+            return f(*args, **kwds)
+        profiler.reset()
+        profiler.enabled = True
+        try:
+            with timed('total'):
+                return f(*args, **kwds)
+        finally:
+            profiler.enabled = False
+            if profile:
+                click.echo(profiler.format_report(), err=True)
+            if profile_json:
+                json.dump(profiler.report(), profile_json, indent=2,
+                          sort_keys=True)
+    return wrapper
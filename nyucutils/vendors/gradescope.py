@@ -1,30 +1,77 @@
 #!/opt/local/bin/python
 import csv
+import functools
 import logging
 import os
 
 import click
 
+from nyucutils import pipeline
+from nyucutils.utils import log_time, profile_options, timed
+
 
 @click.command()
-@click.argument('nyucgbfile')
+@profile_options
+@click.argument('nyucgbfiles', nargs=-1, required=True,
+                type=click.Path(exists=True),
+                metavar='NYUCGBFILE...')
+@click.option('-o', '--output',
+              type=click.File('w'),
+              default='-',
+              help='write to this file')
 @click.option('-d', '--debug', is_flag=True, default=False,
               help='print lots of debugging statements')
 @click.option('-v', '--verbose', is_flag=True, default=False,
               help="Be verbose")
-def munge(nyucgbfile, debug, verbose):
-    """ Convert an NYU Classes Gradebook file to a Gradescope roster file"""
-    with open(nyucgbfile) as csvfile:
-        reader = csv.DictReader(csvfile)
-        click.echo("Full Name,Email,NetID")
-        for row in reader:
-            lastname, firstname = row['Student Name'].split(', ')
-            netId = row['Student ID']
-            email = netId + '@nyu.edu'
-            click.echo("%s %s,%s,%s" % (firstname, lastname, email, netId))
+def munge(nyucgbfiles, output, debug, verbose):
+    """ Convert NYU Classes Gradebook files to a Gradescope roster file
+
+    Students in more than one gradebook (e.g., several sections of one
+    course) are listed once.  Names are expected as "Last, First"; names
+    without a comma are used as they are.  The gradebooks are read
+    concurrently.
+    """
+    import pandas
+    logging.basicConfig(level=(logging.DEBUG if debug else (logging.INFO if verbose else logging.WARNING)))
+
+    def read_students(f):
+        return pandas.read_csv(f, usecols=['Student ID', 'Student Name'],
+                               dtype=str)
+
+    with timed('parse.nyuclasses'):
+        students = pandas.concat(
+            pipeline.load_files((path, read_students) for path in nyucgbfiles),
+            ignore_index=True).drop_duplicates('Student ID')
+    roster = roster_from_students(students)
+    with timed('write'):
+        roster.to_csv(output, index=False)
+
+
+@log_time('roster')
+def roster_from_students(students):
+    """Make a Gradescope roster from NYU Classes students
+
+    `students` is a DataFrame with "Student ID" and "Student Name" columns.
+    Returns a DataFrame with "Full Name", "Email" and "NetID" columns.
+    """
+    import pandas
+    names = students['Student Name'].fillna('').str.split(',', n=1, expand=True)
+    # no commas, or no students at all, give fewer than two columns
+    names = names.reindex(columns=[0, 1]).astype(object)
+    (lastname, firstname) = (names[0].str.strip(), names[1].str.strip())
+    no_comma = firstname.isna()
+    for name in students.loc[no_comma.to_numpy(), 'Student Name']:
+        logging.warning("%r is not of the form 'Last, First'; using it as is",
+                        name)
+    fullname = (firstname + ' ' + lastname).where(~no_comma, lastname)
+    netId = students['Student ID']
+    return pandas.DataFrame({'Full Name': fullname.to_numpy(),
+                             'Email': (netId + '@nyu.edu').to_numpy(),
+                             'NetID': netId.to_numpy()})
 
 
 @click.command()
+@profile_options
 @click.argument('gsgbfile',
                 type=click.Path(exists=True),
                 metavar='GRADESCOPE_FILE')
@@ -39,8 +86,7 @@ def munge(nyucgbfile, debug, verbose):
 def gs2nyuc(gsgbfile, max_pts, output, debug, verbose):
     """Convert a Gradescope gradebook file to a NYU Classes gradebook file"""
     logging.basicConfig(level=(logging.DEBUG if debug else (logging.INFO if verbose else logging.WARNING)))
-    assignment_name = gsgbfile.split('_scores')[0]
-    assignment_name = assignment_name.replace('_', ' ')
+    assignment_name = scores_assignment_name(gsgbfile)
     with open(gsgbfile) as csvfile:
         reader = csv.DictReader(csvfile)
         if output is None:
@@ -48,9 +94,104 @@ def gs2nyuc(gsgbfile, max_pts, output, debug, verbose):
             output_path = root + '.nyucgb' + ext
             output = open(output_path, 'w')
         writer = csv.writer(output)
-        writer.writerow(["Student ID",assignment_name])
-        for row in reader:
-            if row['Total Score']:
-                row['Percent'] = float(row['Total Score']) / float(max_pts) * 100
-                writer.writerow([row['SID'], "%.2f " % row['Percent']])
+        with timed('convert'):
+            writer.writerow(["Student ID",assignment_name])
+            for row in reader:
+                if row['Total Score']:
+                    row['Percent'] = float(row['Total Score']) / float(max_pts) * 100
+                    writer.writerow([row['SID'], "%.2f " % row['Percent']])
         output.close()
+
+
+def scores_assignment_name(gsgbfile):
+    """Return the assignment name of a Gradescope scores file
+
+    >>> scores_assignment_name('exports/Homework_3_scores.csv')
+    'Homework 3'
+    """
+    assignment_name = os.path.basename(gsgbfile).split('_scores')[0]
+    return assignment_name.replace('_', ' ')
+
+
+@log_time('parse.gradescope')
+def read_scores(gsgbfile, max_pts=None):
+    """Read a Gradescope scores file into a Series of percentages by SID
+
+    `gsgbfile` is a path or a file object with a ``name``.  If `max_pts`
+    is None, the "Max Points" column of the export is used.  Students
+    without a score are left out.
+    """
+    import pandas
+    df = pandas.read_csv(gsgbfile, dtype={'SID': str})
+    gsgbfile = getattr(gsgbfile, 'name', gsgbfile)
+    df = df[df['Total Score'].notna()]
+    no_sid = df['SID'].isna()
+    if no_sid.any():
+        logging.warning("%s: ignoring %d scores without an SID", gsgbfile,
+                        no_sid.sum())
+        df = df[~no_sid]
+    if max_pts is None:
+        if 'Max Points' not in df:
+            raise click.UsageError(
+                "%s has no Max Points column; give max_pts in a manifest"
+                % gsgbfile)
+        max_pts = df['Max Points']
+    percent = df['Total Score'].astype(float) / pandas.to_numeric(max_pts) * 100
+    percent.index = df['SID']
+    percent.name = scores_assignment_name(gsgbfile)
+    duplicated = percent.index.duplicated()
+    if duplicated.any():
+        logging.warning("%s: ignoring repeated SIDs %s", gsgbfile,
+                        ', '.join(percent.index[duplicated].astype(str)))
+    return percent[~duplicated]
+
+
+@click.command()
+@profile_options
+@click.argument('gsgbfiles', nargs=-1,
+                type=click.Path(exists=True),
+                metavar='GRADESCOPE_FILE...')
+@click.option('-m', '--manifest',
+              type=click.Path(exists=True),
+              help='CSV file with columns "file" and "max_pts"')
+@click.option('-o', '--output',
+              type=click.File('w'),
+              default='-',
+              help='write to this file')
+@click.option('-d', '--debug', is_flag=True, default=False,
+              help='print lots of debugging statements')
+@click.option('-v', '--verbose', is_flag=True, default=False,
+              help="Be verbose")
+def gs2nyuc_merge(gsgbfiles, manifest, output, debug, verbose):
+    """Merge Gradescope gradebook files into one NYU Classes gradebook file
+
+    Each Gradescope scores file becomes a column of percentages, named
+    after the file as in `gs2nyuc`, with one row per Student ID.  Maximum
+    points are read from each file's "Max Points" column, unless the file
+    is listed in the manifest, whose "max_pts" column then takes
+    precedence.  Files listed in the manifest needn't be repeated as
+    arguments (relative paths are relative to the manifest).  The files
+    are read concurrently.
+    """
+    import pandas
+    logging.basicConfig(level=(logging.DEBUG if debug else (logging.INFO if verbose else logging.WARNING)))
+    max_pts = {}
+    files = []
+    if manifest:
+        root = os.path.dirname(manifest)
+        with open(manifest) as csvfile:
+            for row in csv.DictReader(csvfile):
+                path = os.path.join(root, row['file'])
+                max_pts[path] = row.get('max_pts') or None
+                files.append(path)
+    files.extend(path for path in gsgbfiles if path not in max_pts)
+    if not files:
+        raise click.UsageError("no Gradescope files given")
+    columns = pipeline.load_files(
+        (path, functools.partial(read_scores, max_pts=max_pts.get(path)))
+        for path in files)
+    with timed('merge'):
+        merged = pandas.concat(columns, axis=1, join='outer')
+        merged.index.name = 'Student ID'
+    with timed('write'):
+        merged.to_csv(output, float_format='%.2f')
@@ -5,18 +5,31 @@ None of this is up-to-date with the interfaces designed in usage.txt.
 
 """
 import argparse
+import concurrent.futures
+import contextlib
 import csv
 import datetime
 from datetime import datetime, date
+import difflib
+import functools
+import io
+import json
 import logging
+import mmap
+import os
 import re
 import sys
+import time
+import unicodedata
 
 import pandas
 import numpy
 import click
 from lxml import etree
-import lxml.html
+
+from nyucutils import pipeline
+from nyucutils.cache import ParseCache
+from nyucutils.utils import log_time, profile_options, profiled_call, profiler, timed
 
 class WebassignMent(object):
     """Class to hold information about a WebAssign assignment
@@ -30,34 +43,64 @@ class WebassignMent(object):
     "web assignment", we go with :code:`WebassignMent`.
 
     """
+    __slots__=('name','category','available','due')
+
     def __init__(self,name=None,category=None,available=None,due=None):
         self.name=name
         self.category=category
         self.available=available
         self.due=due
 
+WADATETIME_PATTERN=re.compile(r'(\d+)-(\d+)-(\d+).(\d{2}):(\d{2}) (AM|PM).([A-Z]+)')
+
+# UTC offsets (in hours) of the time zone abbreviations in WebAssign dates
+TIME_ZONE_OFFSETS={
+    'UTC':0, 'GMT':0,
+    'EST':-5, 'EDT':-4,
+    'CST':-6, 'CDT':-5,
+    'MST':-7, 'MDT':-6,
+    'PST':-8, 'PDT':-7,
+}
+
+@functools.lru_cache(maxsize=1024)
 def wadatetime_to_datetime(date_string):
     """convert a WebAssign date string to a `datetime.datetime` object
+
+    Results are memoized, since many assignments share due times.
+
+    >>> wadatetime_to_datetime('5-2-16 05:00 PM EDT')
+    datetime.datetime(2016, 5, 2, 17, 0)
     """
-    # TODO: replace debugging statements with doctests
-    log = logging.getLogger("wadatetime_to_datetime")
-    match = re.search(r'(\d+)-(\d+)-(\d+).(\d{2}):(\d{2}) (AM|PM).([A-Z]+)',date_string)
-    log.debug('match: %s',match.groups())
-    (month,day,year,hour,minute,ampm,time_zone) = match.groups()
-    log.debug("month: %s",month)
-    log.debug("day: %s",day)
-    log.debug("year: %s",year)
-    log.debug("hour: %s",hour)
-    log.debug("minute: %s",minute)
-    log.debug("ampm: %s",ampm)
+    (month,day,year,hour,minute,ampm,time_zone) = \
+        WADATETIME_PATTERN.search(date_string).groups()
     # Instantiate the datetime object.
     # This is a "naive" object; which is probably OK.
-    dt = datetime.datetime(
+    return datetime(
         int(year)+2000,int(month),int(day),
         (int(hour) % 12) + (12 if ampm == 'PM' else 0),
         int(minute))
-    log.debug("dt: %s",dt)
-    return dt
+
+def wadatetimes_to_datetime64(date_strings,tz='America/New_York'):
+    """convert a sequence of WebAssign date strings to a Series of
+    time zone-aware datetime64 values, all at once
+
+    The time zone abbreviation in each string (see `TIME_ZONE_OFFSETS`)
+    fixes its UTC offset; the results are converted to time zone `tz`.
+    Strings that can't be parsed become NaT.
+
+    >>> wadatetimes_to_datetime64(['5-2-16 05:00 PM EDT','12-1-16 11:59 PM EST']).tolist()
+    [Timestamp('2016-05-02 17:00:00-0400', tz='America/New_York'), Timestamp('2016-12-01 23:59:00-0500', tz='America/New_York')]
+    """
+    parts=pandas.Series(date_strings,dtype=object).str.extract(WADATETIME_PATTERN)
+    (month,day,year,hour,minute,ampm,time_zone)=(parts[i] for i in range(7))
+    local=pandas.to_datetime(pandas.DataFrame({
+        'year':year.astype(float)+2000,
+        'month':month.astype(float),
+        'day':day.astype(float),
+        'hour':hour.astype(float) % 12 + numpy.where(ampm == 'PM',12,0),
+        'minute':minute.astype(float)}))
+    offsets=pandas.to_timedelta(time_zone.map(TIME_ZONE_OFFSETS),unit='h')
+    return (local - offsets).dt.tz_localize('UTC').dt.tz_convert(tz)
 
 def isodate_format(date):
     """Serialize a datetime.DateTime object with `ISO 8601`_ date style
@@ -74,57 +117,314 @@ def localdatetime_format(date):
     # Un-zero-pad hours and monthday
     return date.strftime("%A %B %d %I:%M%p").replace(" 0"," ")
 
+# The assignment rows of a ClassView page are the rows of
+# //*[@id="wa"]/table/tbody/tr[3]/td[2]/div[2]/table/tbody.
+# This tests a row for that, looking up from the row, so it can be
+# applied as soon as the row is parsed.
+_IS_ASSIGNMENT_ROW=etree.XPath(
+    'boolean(parent::tbody/parent::table'
+    '/parent::div[count(preceding-sibling::div)=1]'
+    '/parent::td[count(preceding-sibling::td)=1]'
+    '/parent::tr[count(preceding-sibling::tr)=2]'
+    '/parent::tbody/parent::table/parent::*[@id="wa"])')
+_ASSIGNMENT_NAME=etree.XPath('.//font/b/text()')
+_ASSIGNMENT_DATES=etree.XPath('font')
+
+def iter_assignments_from_html(file):
+    """
+    Extract the assignment data from a WebAssign ClassView HTML page,
+    yielding WebassignMent objects as their table rows are parsed.
+
+    The page is parsed incrementally, and each assignment row is discarded
+    once read, so memory use stays flat however long the page is.  A
+    warning is logged if the page has no assignment rows (e.g., because
+    its layout changed).
+    """
+    log = logging.getLogger('assignments_from_html')
+    found=0
+    for (event,row) in etree.iterparse(file,events=('end',),tag='tr',html=True):
+        if not _IS_ASSIGNMENT_ROW(row):
+            continue
+        if (len(row) >= 4):
+            name=_ASSIGNMENT_NAME(row[0])[0]
+            log.debug('name: %s',name)
+            dates=_ASSIGNMENT_DATES(row[3])[0]
+            avail_date_string=dates.text # looks like [ 5-2-16 05:00 PM EDT ]
+            due_date_string=dates[0].tail # looks like [ 5-2-16 05:00 PM EDT ]
+            found+=1
+            yield WebassignMent(name=name,
+                available=wadatetime_to_datetime(avail_date_string),
+                due=wadatetime_to_datetime(due_date_string))
+        # free the rows already read
+        row.clear()
+        while row.getprevious() is not None:
+            del row.getparent()[0]
+    if not found:
+        log.warning("%s: no assignments found; is it a WebAssign ClassView page?",
+            getattr(file,'name',file))
+
 def assignments_from_html(file):
     """
     Extract the assignment data from a WebAssign ClassView HTML page.
 
     return a list of WebassignMent objects
     """
-    log = logging.getLogger('assignments_from_html')
-    tree = lxml.html.parse(file)
-    try:
-        table=tree.xpath('//*[@id="wa"]/table/tbody/tr[3]/td[2]/div[2]/table/tbody')[0]
-    except:
-        raise
-    assignments=[]
-    for row in table:
-        if (len(row) < 4):
-            continue
-        name=row[0].xpath('.//font/b/text()')[0]
-        log.debug('name: %s',name)
-        dates=row[3].xpath('font')[0]
-        avail_date_string=dates.text
-        log.debug("avail_date_string: %s", repr(avail_date_string)) # looks like [ 5-2-16 05:00 PM EDT ]
-        due_date_string=dates[0].tail
-        log.debug("due_date_string: %s", repr(due_date_string)) # looks like [ 5-2-16 05:00 PM EDT ]
-        avail_date=wadatetime_to_datetime(avail_date_string)
-        due_date=wadatetime_to_datetime(due_date_string)
-        assignments.append(WebassignMent(name=name,available=avail_date,due=due_date))
-    return assignments
+    return list(iter_assignments_from_html(file))
+
+
+class AssignmentTable(object):
+    """A table of WebAssign assignments, with one column per WebassignMent
+    attribute
+
+    The table is backed by a DataFrame (the `frame` attribute) whose
+    "available" and "due" columns are datetime64, so that filtering,
+    sorting, and formatting work on whole columns at once.
+    """
+
+    columns=list(WebassignMent.__slots__)
+
+    def __init__(self,frame=None):
+        if frame is None:
+            frame=pandas.DataFrame.from_records([],columns=self.columns)
+            frame['available']=pandas.to_datetime(frame['available'])
+            frame['due']=pandas.to_datetime(frame['due'])
+        self.frame=frame
+
+    @classmethod
+    def from_assignments(cls,assignments):
+        "make a table from an iterable of WebassignMent objects"
+        frame=pandas.DataFrame.from_records(
+            [(a.name,a.category,a.available,a.due) for a in assignments],
+            columns=cls.columns)
+        frame['available']=pandas.to_datetime(frame['available'])
+        frame['due']=pandas.to_datetime(frame['due'])
+        return cls(frame)
+
+    @classmethod
+    def from_html(cls,file):
+        "make a table from a WebAssign ClassView HTML page"
+        return cls.from_assignments(iter_assignments_from_html(file))
+
+    @classmethod
+    def concat(cls,tables,keys=None,name='course'):
+        """concatenate `tables` into one table
+
+        If `keys` is given, a first column `name` holds the key of the table
+        each row came from.
+        """
+        frames=[table.frame for table in tables]
+        if keys is not None:
+            frames=[frame.assign(**{name:key})[[name] + list(frame.columns)]
+                for (frame,key) in zip(frames,keys)]
+        if not frames:
+            return cls()
+        return cls(pandas.concat(frames,ignore_index=True))
+
+    def __len__(self):
+        return len(self.frame)
+
+    def __iter__(self):
+        "iterate over the rows as WebassignMent objects"
+        for row in self.frame[self.columns].itertuples(index=False):
+            yield WebassignMent(name=row.name,category=row.category,
+                available=row.available.to_pydatetime(),
+                due=row.due.to_pydatetime())
+
+    def due_between(self,start=None,end=None):
+        "return the table of assignments due from `start` until `end`"
+        mask=pandas.Series(True,index=self.frame.index)
+        if start is not None:
+            mask&=self.frame['due'] >= start
+        if end is not None:
+            mask&=self.frame['due'] <= end
+        return self.__class__(self.frame[mask])
+
+    def sort_by_due(self):
+        "return the table sorted by due date (stably)"
+        return self.__class__(self.frame.sort_values('due',kind='stable'))
+
+    def announcements(self):
+        """return a DataFrame of NYU Classes announcements, one per row,
+        with columns startDate, endDate, and announcementText"""
+        due=self.frame['due'].dt
+        # see localdatetime_format
+        local_due=due.strftime("%A %B %d %I:%M%p").str.replace(" 0"," ")
+        return pandas.DataFrame({
+            'startDate':self.frame['available'].dt.strftime("%Y-%m-%d"),
+            'endDate':due.strftime("%Y-%m-%d"),
+            'announcementText':"WebAssignment “" + self.frame['name'] + "” due " + local_due})
+
+
+def drop_lowest_average(scores,drop_count):
+    """average each row of `scores` after dropping its `drop_count` lowest
+
+    `scores` is a student by assignment matrix (array or DataFrame).
+    Missing scores count as 0.  All rows are handled at once with a
+    partial sort, and at least one score per row is always kept.
+
+    >>> drop_lowest_average([[80, 100, 90], [0, 50, 100]], 1)
+    array([95., 75.])
+    """
+    scores=numpy.nan_to_num(numpy.asarray(scores,dtype=float))
+    drop_count=min(int(drop_count),scores.shape[1]-1)
+    if drop_count > 0:
+        # the lowest drop_count scores end up in the first drop_count columns
+        scores=numpy.partition(scores,drop_count-1,axis=1)[:,drop_count:]
+    return scores.mean(axis=1)
+
+
+def compact_dtypes(df,id_columns=(),categorical=True):
+    """return `df` with memory-lean column dtypes
+
+    Identity columns in `id_columns` (usernames, names, emails) become the
+    pandas string dtype, or categorical when `categorical` and fewer than
+    half their values are distinct.  Other columns are left alone; in
+    particular scores stay float64, since float32 rounding errors (e.g.,
+    91.7 stored as 91.69999695) would show up in recalculated grades.
+    """
+    converted={}
+    for col in df.columns:
+        series=df[col]
+        if col in id_columns:
+            if categorical and series.nunique() < len(series)/2:
+                converted[col]=series.astype('category')
+            else:
+                converted[col]=series.astype('string')
+    if not converted:
+        return df
+    df=df.copy(deep=False)
+    for (col,series) in converted.items():
+        df[col]=series
+    return df
+
+
+def memory_report(df):
+    """return a DataFrame of the dtype and memory use in bytes of each
+    column of `df`, with a "Total" row"""
+    usage=df.memory_usage(index=False,deep=True)
+    report=pandas.DataFrame({'dtype':df.dtypes.astype(str),'bytes':usage})
+    report.loc['Total']=['',usage.sum()]
+    return report
+
+
+def line_offsets(buf,count):
+    """return the offsets just past each of the first `count` newlines in
+    `buf` (bytes or mmap); missing lines end at the end of `buf`"""
+    offsets=[]
+    pos=0
+    for i in range(count):
+        pos=buf.find(b'\n',pos)
+        pos=len(buf) if pos < 0 else pos+1
+        offsets.append(pos)
+    return offsets
+
+
+class BufferReader(io.RawIOBase):
+    """A read-only binary file over a buffer (bytes, mmap, memoryview)
+
+    The buffer is not copied; each read copies only what is asked for.
+    Closing the reader releases its view of the buffer.
+    """
+
+    def __init__(self,buf):
+        self.view=memoryview(buf).cast('B')
+        self.pos=0
+
+    def readable(self):
+        return True
+
+    def readinto(self,b):
+        n=min(len(b),len(self.view)-self.pos)
+        b[:n]=self.view[self.pos:self.pos+n]
+        self.pos+=n
+        return n
+
+    def close(self):
+        if not self.closed:
+            self.view.release()
+        super().close()
 
 
 # not sure this is necessary.
 class WagbParser(object):
     """Parses WebAssign GradeBook (sic) CSV (sic) files.
-    Creates a WebAssignGradeBook"""
+    Creates a WebAssignGradeBook
+
+    The file is memory-mapped and split into blocks by line number:
+
+    * lines 1-3: section name, instructor, and export date
+    * line 5: assignment categories (the grades body header)
+    * line 6: category weights
+    * line 8: student field names
+    * lines 9-: grades
+    """
+
+    # bump when parse() changes, to invalidate cached parses
+    cache_version=3
+
+    # zero-based line numbers of the GradeBook blocks
+    METADATA_LINES = slice(0, 3)
+    CATEGORY_LINE = 4
+    WEIGHT_LINE = 5
+    HEADER_LINE = 7
+    FIRST_GRADE_LINE = 8
 
     def __init__(self,file=None):
         if file:
             self.file=file
 
-    def parse(self):
-        result=WebAssignGradeBook();
+    @contextlib.contextmanager
+    def blocks(self):
+        """memory-map the file and yield a pair ``(lines, body)``
 
-        # GradeBook metadata
-        mddf=pandas.read_csv(self.file,nrows=3,sep='\t',header=None).T
-        mddf.columns=['Section Name','Instructor','Date']
-        metadata=mddf.loc[0]
-        result.section_name=metadata['Section Name']
-        result.instructor_name=metadata['Instructor']
-        result.date=datetime.strptime(metadata['Date'],'%A, %B %d, %Y %I:%M %p %Z')
+        ``lines`` are the (decoded) lines before the grades, and ``body`` is
+        a memoryview of the grade lines, found by scanning for the first
+        newlines.  File-like objects are read into memory instead.  The
+        views are released and the file unmapped on exit.
+        """
+        if hasattr(self.file,'read'):
+            data=self.file.read()
+            if isinstance(data,str):
+                data=data.encode('utf-8')
+            mapped=None
+        else:
+            with io.open(self.file,'rb') as f:
+                mapped=data=mmap.mmap(f.fileno(),0,access=mmap.ACCESS_READ)
+        view=memoryview(data)
+        try:
+            ends=line_offsets(data,self.FIRST_GRADE_LINE)
+            starts=[0]+ends[:-1]
+            lines=[bytes(view[start:end]).decode('utf-8').rstrip('\r\n')
+                for (start,end) in zip(starts,ends)]
+            body=view[ends[-1]:]
+            try:
+                yield (lines,body)
+            finally:
+                body.release()
+        finally:
+            view.release()
+            if mapped is not None:
+                mapped.close()
 
-        # Category names
-        categories=pandas.read_csv(self.file,sep='\t',skiprows=4,nrows=2,header=None,index_col=0).T.dropna()
+    def parse_metadata(self,lines):
+        "return (section name, instructor, date) from the metadata lines"
+        (section_name,instructor,date_string) = [
+            line.split('\t')[0] for line in lines[self.METADATA_LINES]]
+        # the trailing time zone abbreviation (EST, EDT) is dropped;
+        # strptime's %Z only understands UTC and the local zone.
+        date_string=date_string.strip().rsplit(' ',1)[0]
+        return (section_name,instructor,
+            datetime.strptime(date_string,'%A, %B %d, %Y %I:%M %p'))
+
+    def parse_categories(self,lines):
+        "return the category DataFrame from the category and weight lines"
+        cat_fields=lines[self.CATEGORY_LINE].split('\t')
+        weight_fields=lines[self.WEIGHT_LINE].split('\t')
+        categories=pandas.DataFrame(
+            [cat_fields[1:],weight_fields[1:]],
+            index=[cat_fields[0],weight_fields[0]]).T
+        categories.index=categories.index+1
+        categories=categories.replace('',numpy.nan).dropna()
         # warning: The regexp below assumes there are no spaces in the category name
         newcols=categories['Assignment Category'].str.extract('(?P<cat_name>[^ ]*)( \[(?P<cat_count>\d+)\])?',expand=True)
         del newcols[1]
@@ -132,26 +432,119 @@ class WagbParser(object):
         newcols=categories['Weight'].str.extract('(?P<weight_value>[^ ]*)( \[(?P<drop_count>\d+)\])?',expand=True)
         del newcols[1]
         categories=categories.combine_first(newcols)
-        # result.categories=categories[categories.cat_count.notnull()]
-        result.categories=categories
+        categories['weight_value']=pandas.to_numeric(categories['weight_value'])
+        categories['drop_count']=pandas.to_numeric(categories['drop_count'])
+        return categories
+
+    def parse_student_fields(self,lines):
+        "return the student field names from the header line"
+        # the header line ends with a tab, hence an empty last field
+        return pandas.Index(lines[self.HEADER_LINE].rstrip('\t').split('\t'))
+
+    def grade_columns(self,lines,student_fields):
+        "return the column names of the grades body"
+        columns=pandas.read_csv(io.StringIO(lines[self.CATEGORY_LINE]),
+            sep='\t',nrows=0).columns
+        colmap=dict(zip(columns,student_fields))
+        return [colmap.get(col,col) for col in columns]
+
+    def parse_grades(self,body,columns,student_fields):
+        "return the grades DataFrame from the grade lines buffer `body`"
+        with BufferReader(body) as reader:
+            df = pandas.read_csv(reader,sep='\t',header=None,names=columns)
+        df=df.dropna(how='any',axis=1)
+        return compact_dtypes(df,student_fields)
+
+    def parse_head(self,lines):
+        "return a WebAssignGradeBook with everything but the grades"
+        result=WebAssignGradeBook();
+
+        # GradeBook metadata
+        (result.section_name,result.instructor_name,result.date) = \
+            self.parse_metadata(lines)
+
+        # Category names
+        result.categories=self.parse_categories(lines)
         logging.debug("categories: \n%s",result.categories)
-        final_weight=int(categories.set_index('Assignment Category').loc['Final']['Weight'])
 
-        # Grades
         ## Line 8 contains student fields names
-        result.student_fields=pandas.read_csv(self.file,sep='\t',skiprows=7,nrows=0).columns[:-1]
+        result.student_fields=self.parse_student_fields(lines)
         logging.debug("result.student_fields: %s",result.student_fields)
-        num_student_fields=len(result.student_fields)
+        return result
 
-        df = pandas.read_csv(self.file,skiprows=[0,1,2,3,5,6,7],sep='\t')
-        bad_fields=df[:num_student_fields]
-        colmap=dict(zip(bad_fields,result.student_fields))
-        result._grades=df.rename(columns=colmap).dropna(how='any',axis=1)
+    @log_time('parse.webassign')
+    def parse(self):
+        with self.blocks() as (lines,body):
+            result=self.parse_head(lines)
+            columns=self.grade_columns(lines,result.student_fields)
+            result._grades=self.parse_grades(body,columns,result.student_fields)
+        if logging.getLogger().isEnabledFor(logging.DEBUG):
+            logging.debug("WebAssign GradeBook memory: \n%s",result.memory_report())
         return result
 
+    def read_head(self,f):
+        "read and return the lines before the grades from the file object `f`"
+        lines=[]
+        for i in range(self.FIRST_GRADE_LINE):
+            line=f.readline()
+            if isinstance(line,bytes):
+                line=line.decode('utf-8')
+            lines.append(line.rstrip('\r\n'))
+        return lines
+
+    def parse_stream(self,chunksize=10000):
+        """Parse the GradeBook without loading all the grades at once.
+
+        Returns a pair ``(wagb, chunks)``.  ``wagb`` is a WebAssignGradeBook
+        with metadata, categories and student fields but no grades.
+        ``chunks`` is a generator of grade DataFrames with at most
+        `chunksize` rows each.
+
+        :meth:`parse` drops every column with a missing value anywhere.
+        Here that decision is made incrementally: each chunk omits the
+        columns found to have missing values so far, and once the chunks are
+        exhausted ``self.dropped_columns`` is the complete set, which
+        callers can drop from whatever they kept of the earlier chunks.
+        """
+        if hasattr(self.file,'read'):
+            lines=self.read_head(self.file)
+        else:
+            # the file is only kept open while the chunks are read, so
+            # that it isn't left open if parse_head fails or the chunks
+            # are never read
+            with io.open(self.file,'rb') as f:
+                lines=self.read_head(f)
+                offset=f.tell()
+        result=self.parse_head(lines)
+        columns=self.grade_columns(lines,result.student_fields)
+        self.dropped_columns=set()
+
+        def chunks():
+            if hasattr(self.file,'read'):
+                f=self.file
+            else:
+                f=io.open(self.file,'rb')
+                f.seek(offset)
+            try:
+                reader=pandas.read_csv(f,sep='\t',header=None,names=columns,
+                    chunksize=chunksize,encoding='utf-8')
+                for chunk in reader:
+                    self.dropped_columns.update(chunk.columns[chunk.isna().any()])
+                    chunk=chunk.loc[:,~chunk.columns.isin(self.dropped_columns)]
+                    # categories would differ from chunk to chunk
+                    yield compact_dtypes(chunk,result.student_fields,
+                        categorical=False)
+            finally:
+                if f is not self.file:
+                    f.close()
+        return (result,chunks())
+
 
 class WebAssignGradeBook(object):
 
+    # bumped by invalidate(), so decorators know to recompute
+    version=0
+
     def __init__(self):
         self._grades=pandas.DataFrame(columns=['Username','Fullname'])
         self.categories=pandas.DataFrame({'Assignment Category':['Final'],'Weight':[100]})
@@ -161,63 +554,184 @@ class WebAssignGradeBook(object):
     def grades(self):
         return self._grades
 
+    def invalidate(self):
+        "mark the grades as changed, so that decorators recompute them"
+        self.version+=1
+
+    def memory_report(self):
+        "return the dtype and memory use of each column of the grades"
+        return memory_report(self.grades)
+
 # Decorator Pattern
 class WagbDecorator(WebAssignGradeBook):
+    """abstract decorator class for WebAssignGradeBook
+
+    Subclasses implement :meth:`decorate`, which alters a copy of the
+    component's grades.  The result is cached until the component (or
+    anything upstream of it) is invalidated, so stacked decorators compute
+    once each, and never change their component's grades.
+    """
 
     def __init__(self,wagb=None):
         self._wagb=wagb
         # all Wagb methods/properties get passed to the component
         self.date=self._wagb.date
         self.categories=self._wagb.categories
+        self._changes=0
+        self._cache=None
+        self._cache_version=None
 
     @property
-    def grades(self):
+    def version(self):
+        return self._wagb.version + self._changes
+
+    def invalidate(self):
+        self._changes+=1
+
+    def weights(self):
+        "return the category weights as a Series indexed by category column"
+        cats=self.categories[self.categories.cat_count.notnull()]
+        logging.debug("cats: \n%s",cats)
+        return pandas.Series(cats['weight_value'].values,
+            index=cats['Assignment Category'].values,dtype=float)
+
+    @log_time('recalculate')
+    def recalculate(self,schemes=None,df=None):
+        """recalculate the grades
+
+        Each grade is the weighted average of the category columns, computed
+        for all students as one score matrix by weight matrix product.
+
+        `schemes` maps output column names to weights (dicts or Series
+        indexed by category column), so several "what if" weightings can be
+        computed in the same pass.  Categories a scheme leaves out get weight
+        0; a scheme whose weights sum to 0 raises ValueError.  The default
+        recalculates 'Final' with the GradeBook's weights.
+
+        `df` is altered in place; by default it is a copy of the component's
+        grades.
+        """
+        if df is None:
+            df=self._wagb.grades.copy()
+        if schemes is None:
+            schemes={'Final':self.weights()}
+        weights=pandas.DataFrame(schemes,dtype=float).fillna(0)
+        logging.debug("weights: \n%s",weights)
+        totals=weights.sum()
+        if (totals == 0).any():
+            raise ValueError("weights of scheme %r sum to 0"
+                % totals.index[totals == 0][0])
+        weights=weights/totals
+        scores=df[weights.index].to_numpy(dtype=float)
+        df[list(weights.columns)]=scores @ weights.to_numpy()
+        return df
+
+    def decorate(self,df):
+        "alter `df`, a copy of the component's grades, and return it"
         raise NotImplementedError
 
+    @property
+    def grades(self):
+        version=self.version
+        if self._cache is None or self._cache_version != version:
+            self._cache=self.decorate(self._wagb.grades.copy())
+            self._cache_version=version
+        return self._cache
+
 
 class WagbCorrectDiagnostic(WagbDecorator):
     """WebAssignGradeBook Decorator that rounds up the Quiz column to 100%,
-    and recalculates the grades"""
-
-    def roundup(self,colname):
-        "round up column `colname` to 100% if positive"
-        df=self._wagb.grades
-        newcolname=colname + ' roundup'
-        df[newcolname] = df.apply(lambda x: 100.0 if (x[colname] > 0) else 0.0,axis=1)
-        df[colname] = df[newcolname]
-        del df[newcolname]
+    and recalculates the grades
+
+    Pass `diagnostic_columns` to round up other columns instead, and
+    `schemes` to recalculate with other weights (see :meth:`recalculate`)."""
+
+    diagnostic_columns=['Quiz [1]']
+
+    def __init__(self,wagb=None,diagnostic_columns=None,schemes=None):
+        super().__init__(wagb)
+        if diagnostic_columns is not None:
+            self.diagnostic_columns=diagnostic_columns
+        self.schemes=schemes
+
+    @log_time('roundup')
+    def roundup(self,colnames,threshold=0,df=None):
+        """round up columns `colnames` to 100% if above `threshold`, else 0
+
+        `colnames` is a column name or a list of them.  `threshold` is a
+        number, or a dict mapping column names to numbers.  Missing scores
+        (and columns missing from a `threshold` dict) are set to 0.
+
+        `df` is altered in place; by default it is a copy of the component's
+        grades.
+        """
+        if df is None:
+            df=self._wagb.grades.copy()
+        if isinstance(colnames,str):
+            colnames=[colnames]
+        thresholds=pandas.Series(threshold,index=colnames,dtype=float)
+        passed=df[colnames].gt(thresholds,axis=1)
+        df[colnames]=numpy.where(passed,100.0,0.0)
         return df
 
-    def recalculate(self):
-        "recalculate the grades"
-        df=self._wagb.grades
-        # really should get category weights from the categories DataFrame
+    def decorate(self,df):
+        self.roundup(self.diagnostic_columns,df=df)
+        return self.recalculate(self.schemes,df=df)
+
+class WagbDropLowest(WagbDecorator):
+    """WebAssignGradeBook Decorator that scores each category with a drop
+    count (the "[n]" in the Weight row) as the average of its assignments
+    after dropping the lowest n, then recalculates the grades
+
+    `assignments` maps category columns to lists of assignment columns.
+    By default a category's assignments are the other columns whose names
+    begin with the category name, e.g. "Homework 1" for "Homework [10]".
+    """
+
+    def __init__(self,wagb=None,assignments=None,schemes=None):
+        super().__init__(wagb)
+        self.assignments=assignments
+        self.schemes=schemes
+
+    def assignment_columns(self):
+        "return a dict mapping category columns to their assignment columns"
+        if self.assignments is not None:
+            return self.assignments
+        columns=self._wagb.grades.columns
         cats=self.categories[self.categories.cat_count.notnull()]
-        # logging.debug("cats: \n%s",cats)
-        colnames=cats['Assignment Category'].tolist()
-        logging.debug("colnames: %s",colnames)
-        colweights=cats['weight_value'].tolist()
-        def average(x):
-            # logging.debug('x: %s',x)
-            result=0
-            for i,cat in enumerate(colnames):
-                result+= colweights[i]*x[cat]
-            return result
-        df['Final'] = df.apply(average,axis=1)
+        return dict(
+            (cat,[col for col in columns
+                if col.startswith(cat_name + ' ') and col != cat])
+            for (cat,cat_name) in zip(cats['Assignment Category'],cats['cat_name']))
+
+    @log_time('drop_lowest')
+    def drop_lowest(self,df=None):
+        """replace each category column with its drop-lowest average
+
+        `df` is altered in place; by default it is a copy of the component's
+        grades.
+        """
+        if df is None:
+            df=self._wagb.grades.copy()
+        assignments=self.assignment_columns()
+        cats=self.categories[self.categories.drop_count.notnull()]
+        for (cat,drop_count) in zip(cats['Assignment Category'],cats['drop_count']):
+            colnames=assignments.get(cat)
+            if not colnames:
+                logging.warning("No assignment columns for %s.  Cannot drop lowest.",cat)
+                continue
+            df[cat]=drop_lowest_average(df[colnames],drop_count)
         return df
 
-    @property
-    def grades(self):
-        self.roundup('Quiz [1]')
-        return self.recalculate()
+    def decorate(self,df):
+        self.drop_lowest(df=df)
+        return self.recalculate(self.schemes,df=df)
 
 class WagbAddDatedColumn(WagbDecorator):
     """WebAssignGradeBook Decorator that clones the "Final" column with
     the date (easy for importing to NYU Classes"""
 
-    @property
-    def grades(self):
-        df=self._wagb.grades
+    def decorate(self,df):
         new_column_name = 'WebAssign import %s' % self.date
         df[new_column_name]=df['Final']
         # TODO: rearrange columns http://stackoverflow.com/q/13148429/297797
@@ -225,7 +739,145 @@ class WagbAddDatedColumn(WagbDecorator):
 
 
 
+def email_localpart(emails):
+    "return the part of each email address in Series `emails` before the @"
+    return emails.str.split('@',n=1).str[0]
+
+
+class StudentMatcher(object):
+    """Matches NYU Classes students to rows of a WebAssign GradeBook
+
+    `keys` is a list of (WebAssign column, NYU Classes column) pairs, in
+    order of priority.  The WebAssign "Email" column is matched on its
+    local-part (before the @).  One dict per key is built over the
+    WebAssign grades; where a key value repeats, the first row wins.
+    """
+
+    keys=[
+        # NYU Classes Student ID = WebAssign Username
+        ('Username','Student ID'),
+        # NYU Classes Student Name = WebAssign Fullname
+        ('Fullname','Student Name'),
+        # NYU Classes Student ID = WebAssign Email local-part (before @)
+        ('Email','Student ID')]
+
+    def __init__(self,wa_grades,keys=None):
+        if keys is not None:
+            self.keys=keys
+        self.indexes={}
+        for (wa_col,nyuc_col) in self.keys:
+            if wa_col not in wa_grades:
+                logging.warning("%s not in WebAssign GradeBook.  Cannot attempt %s matching.",wa_col,wa_col)
+                continue
+            values=wa_grades[wa_col]
+            if wa_col == 'Email':
+                values=email_localpart(values)
+            rows=numpy.flatnonzero(values.notna())
+            values=values.iloc[rows]
+            # reversed so that the first of repeated values wins
+            self.indexes[wa_col]=dict(zip(values.iloc[::-1],rows[::-1]))
+
+    @log_time('match')
+    def match(self,students):
+        """match each student in `students` in a single pass
+
+        Returns a DataFrame indexed like `students` with columns "row", the
+        position of the matching WebAssign row (-1 if none),
+        "matched_on", the WebAssign column that matched (missing if none),
+        and "confidence", 1 for a match and missing otherwise.
+        """
+        lookups=[(wa_col,students[nyuc_col].tolist(),self.indexes[wa_col])
+            for (wa_col,nyuc_col) in self.keys if wa_col in self.indexes]
+        rows=numpy.full(len(students),-1)
+        matched_on=[None]*len(students)
+        for i in range(len(students)):
+            for (wa_col,values,index) in lookups:
+                row=index.get(values[i])
+                if row is not None:
+                    rows[i]=row
+                    matched_on[i]=wa_col
+                    break
+        return pandas.DataFrame({'row':rows,'matched_on':matched_on,
+            'confidence':numpy.where(rows >= 0,1.0,numpy.nan)},
+            index=students.index)
+
+
+def normalize_name(name):
+    """return the (surname, given names) of `name`, casefolded and stripped
+    of accents.  Both "Last, First" and "First Last" forms are understood.
+
+    >>> normalize_name('Núñez, José')
+    ('nunez', 'jose')
+    >>> normalize_name('José  Núñez')
+    ('nunez', 'jose')
+    """
+    name=unicodedata.normalize('NFKD',name)
+    name=''.join(c for c in name if not unicodedata.combining(c)).casefold()
+    if ',' in name:
+        (surname,given)=name.split(',',1)
+    else:
+        parts=name.rsplit(None,1)
+        (given,surname)=parts if len(parts) == 2 else ('',name)
+    return (' '.join(surname.split()),' '.join(given.split()))
+
+
+class FuzzyNameMatcher(object):
+    """Matches names approximately, for students no exact key matched
+
+    Names are normalized once (see :func:`normalize_name`) and blocked by
+    surname initial, so each name is compared only with the names in its
+    block rather than with every name.  The confidence of a match is the
+    :class:`difflib.SequenceMatcher` ratio of the normalized names, and
+    matches below `threshold` are rejected.
+    """
+
+    threshold=0.85
+
+    def __init__(self,names,threshold=None):
+        "`names` is a Series of names to match against"
+        if threshold is not None:
+            self.threshold=threshold
+        self.blocks={}
+        for (label,name) in names.items():
+            if not isinstance(name,str):
+                continue
+            (surname,given)=normalize_name(name)
+            if surname:
+                self.blocks.setdefault(surname[0],[]).append(
+                    (label,given + ' ' + surname))
+
+    def match(self,names):
+        """match each name in Series `names` to its closest name
+
+        Returns a DataFrame indexed like `names` with columns "label", the
+        index label of the best match (missing if none), and "confidence".
+        """
+        labels=[]
+        confidences=[]
+        matcher=difflib.SequenceMatcher(autojunk=False)
+        for name in names:
+            (best_label,best)=(None,self.threshold)
+            (surname,given)=normalize_name(name) if isinstance(name,str) else ('','')
+            if surname:
+                matcher.set_seq2(given + ' ' + surname)
+                for (label,candidate) in self.blocks.get(surname[0],[]):
+                    matcher.set_seq1(candidate)
+                    if matcher.real_quick_ratio() < best or matcher.quick_ratio() < best:
+                        continue
+                    ratio=matcher.ratio()
+                    if ratio >= best:
+                        (best_label,best)=(label,ratio)
+            labels.append(best_label)
+            confidences.append(best if best_label is not None else numpy.nan)
+        return pandas.DataFrame({'label':labels,'confidence':confidences},
+            index=names.index)
+
+
 class NyuClassesGradebook(object):
+
+    # bumped by invalidate(), so decorators know to recompute
+    version=0
+
     def __init__(self):
         "constructor"
         self.student_columns=['Student ID','Student Name']
@@ -239,22 +891,41 @@ class NyuClassesGradebook(object):
     def grades(self):
         return self._grades
 
+    def invalidate(self):
+        "mark the grades as changed, so that decorators recompute them"
+        self.version+=1
+
+    def memory_report(self):
+        "return the dtype and memory use of each column of the grades"
+        return memory_report(self.grades)
+
 class NyucgbParser(object):
     "NYU Classes gradebook CSV file parser"
 
+    # bump when parse() changes, to invalidate cached parses
+    cache_version=3
+
     def __init__(self,file=None):
         self.file=file
 
+    @log_time('parse.nyuclasses')
     def parse(self):
         gb=NyuClassesGradebook()
         if self.file is not None:
-            gb._grades=pandas.read_csv(self.file)
+            gb._grades=compact_dtypes(pandas.read_csv(self.file),
+                gb.student_columns)
+            if logging.getLogger().isEnabledFor(logging.DEBUG):
+                logging.debug("NYU Classes gradebook memory: \n%s",gb.memory_report())
         # TODO: parse file name for site id and date (why not?)
         return gb
 
 
 class NyucgbDecorator(NyuClassesGradebook):
-    "abstract decorator class for NyuClassesGradebook"
+    """abstract decorator class for NyuClassesGradebook
+
+    As with :class:`WagbDecorator`, subclasses implement :meth:`decorate`
+    and the result is cached until something upstream is invalidated.
+    """
 
     def __init__(self,component=None):
         logging.debug("NyucgbDecorator: begin")
@@ -262,69 +933,199 @@ class NyucgbDecorator(NyuClassesGradebook):
         # all component properties that aren't overwritten
         # are passed to the component
         self.student_columns=self._component.student_columns
+        self._changes=0
+        self._cache=None
+        self._cache_version=None
+
+    @property
+    def version(self):
+        return self._component.version + self._changes
+
+    def invalidate(self):
+        self._changes+=1
 
     @property
     def students(self):
         return self._component.students
 
-    @property
-    def grades(self):
+    def decorate(self):
         # Instead of raising a NotImplementedError,
         # we just use the identity decoration
         return self._component.grades
 
+    @property
+    def grades(self):
+        version=self.version
+        if self._cache is None or self._cache_version != version:
+            self._cache=self.decorate()
+            self._cache_version=version
+        return self._cache
+
 
 class NyucgbDecorator(NyucgbDecorator):
-    "Decorates an NYU Classes gradebook by merging a WebAssign gradebook"
+    """Decorates an NYU Classes gradebook by merging a WebAssign gradebook
 
-    def __init__(self,component=None,wagb=None):
+    Students are matched on exact keys (see :class:`StudentMatcher`).  With
+    `fuzzy`, students left unmatched are then matched by name to the
+    WebAssign rows left unmatched (see :class:`FuzzyNameMatcher`).  The
+    matches are kept in the `matches` attribute.
+    """
+
+    def __init__(self,component=None,wagb=None,fuzzy=False):
         logging.debug("NyucgbDecorator constructor begin")
         super().__init__(component)
         self.wagb=wagb
+        self.fuzzy=fuzzy
+        self._matcher=None
+        self._matcher_version=None
 
     @property
-    def grades(self):
+    def version(self):
+        return self._component.version + self.wagb.version + self._changes
+
+    @property
+    def matcher(self):
+        "the StudentMatcher of the WebAssign grades, rebuilt when they change"
+        if self._matcher is None or self._matcher_version != self.wagb.version:
+            self._matcher=StudentMatcher(self.wagb.grades)
+            self._matcher_version=self.wagb.version
+        return self._matcher
+
+    def decorate(self):
         students=self.students
         wa_grades=self.wagb.grades
-        # Merge attempt 1: NYU Classes Student ID = WebAssign Username
-        m1=students.merge(wa_grades,left_on='Student ID',right_on='Username',how='left')
-        # Merge attempt 2: NYU Classes Student Name = WebAssign Fullname
-        m2=students.merge(wa_grades,left_on='Student Name',right_on='Fullname',how='left')
-        # Merge attempt 3: NYU Classes Student ID = WebAssign Email local-part (before @)
-        try:
-            wa_grades['Email_localpart'],wa_grades['Email_domain'] = wa_grades.Email.str.split('@',1).str
-            m3=students.merge(wa_grades,left_on='Student ID',right_on='Email_localpart')
-            del m3['Email_localpart'], m3['Email_domain']
-        except AttributeError:
-            logging.warning("Email addresses not in WebAssign GradeBook.  Cannot attempt email matching.")
-            m3=m1
-        # I don't think we are supposed to alter the object here.
-        # Just pass the result
-        return m1.combine_first(m2).combine_first(m3)
+        self.matches=self.matcher.match(students)
+        if self.fuzzy:
+            self.fuzzy_match(students,wa_grades)
+        logging.info("matches: \n%s",self.matches['matched_on'].value_counts(dropna=False))
+        for name in students.loc[self.matches['row'] < 0,'Student Name']:
+            logging.warning("%s not found in WebAssign GradeBook.",name)
+        # unmatched students (row -1) get a row of NaN
+        matched=wa_grades.reset_index(drop=True).reindex(self.matches['row'])
+        matched.index=students.index
+        matched=matched.rename(columns=lambda col:
+            'WebAssign ' + col if col in students else col)
+        # Only the merged result is new; the components are not altered.
+        return pandas.concat([students,matched],axis=1)
+
+    @log_time('match.fuzzy')
+    def fuzzy_match(self,students,wa_grades):
+        """match the unmatched students in `self.matches` by name
+
+        Each WebAssign row is matched to at most one student: where several
+        students match the same row, the most confident match wins and the
+        others are left unmatched.
+        """
+        matches=self.matches
+        unmatched=students.loc[matches['row'] < 0,'Student Name']
+        free=numpy.setdiff1d(numpy.arange(len(wa_grades)),matches['row'])
+        if unmatched.empty or not len(free) or 'Fullname' not in wa_grades:
+            return
+        names=pandas.Series(wa_grades['Fullname'].to_numpy()[free],index=free)
+        found=FuzzyNameMatcher(names).match(unmatched).dropna()
+        found=found.sort_values('confidence',ascending=False,kind='stable')
+        clashes=found['label'].duplicated()
+        for (label,row,confidence) in zip(found.index[clashes],
+                found.loc[clashes,'label'],found.loc[clashes,'confidence']):
+            logging.warning("%s also matches %s by name (confidence %.2f), "
+                "but a closer match took it; left unmatched.",
+                unmatched[label],names[row],confidence)
+        found=found[~clashes]
+        for (label,row,confidence) in zip(found.index,found['label'],found['confidence']):
+            logging.warning("%s matched by name to %s (confidence %.2f).",
+                unmatched[label],names[row],confidence)
+        matches.loc[found.index,'row']=found['label'].astype(int)
+        matches.loc[found.index,'matched_on']='fuzzy'
+        matches.loc[found.index,'confidence']=found['confidence']
+
+@log_time('parse.webassign.stream')
+def roster_grades(chunks,students,fuzzy=False):
+    """Concatenate WebAssign grade chunks, keeping only the rows that could
+    match a student in `students` (an NYU Classes roster).
+
+    A row is kept if its Username or Email local-part is a roster Student ID,
+    or its Fullname is a roster Student Name.  With `fuzzy`, rows whose
+    Fullname approximately matches a roster Student Name are kept too.
+    Memory use is bounded by the chunk size plus the kept rows.  Key
+    columns the chunks lack (dropped by :meth:`WagbParser.parse_stream` for
+    missing values) are skipped.
+    """
+    ids=set(students['Student ID'])
+    names=set(students['Student Name'])
+    if fuzzy:
+        name_matcher=FuzzyNameMatcher(students['Student Name'])
+    kept=[]
+    for chunk in chunks:
+        mask=pandas.Series(False,index=chunk.index)
+        if 'Username' in chunk:
+            mask|=chunk['Username'].isin(ids)
+        if 'Fullname' in chunk:
+            mask|=chunk['Fullname'].isin(names)
+            if fuzzy:
+                mask|=name_matcher.match(chunk['Fullname'])['label'].notna()
+        if 'Email' in chunk:
+            mask|=email_localpart(chunk['Email']).isin(ids)
+        kept.append(chunk[mask])
+    if not kept:
+        return pandas.DataFrame(columns=['Username','Fullname'])
+    return pandas.concat(kept,ignore_index=True)
 
 @click.command()
-@click.argument('input',type=click.Path(exists=True),metavar='FILE')
+@profile_options
+@click.argument('inputs',nargs=-1,required=True,
+    type=click.Path(exists=True),metavar='FILE_OR_DIRECTORY...')
 @click.option('-o','--output',
     type=click.File('w'),
     default='-',
     help='write to this file'
 )
+@click.option('-j','--jobs',type=int,default=None,
+    help='number of worker processes (default: one per CPU)')
 @click.option('-d','--debug',is_flag=True,default=False,help='print lots of debugging statments')
 @click.option('-v','--verbose',is_flag=True,default=False,help="Be verbose")
-def assignments_from_html_to_csv(input,output,debug,verbose):
+def assignments_from_html_to_csv(inputs,output,jobs,debug,verbose):
     """Extract assignments from HTML page and export CSV
+
+    Given several pages, or a directory of ``*.html`` pages, the pages are
+    parsed in parallel worker processes and merged into one CSV file with
+    an extra "course" column (the page's file name without extension).
+    Rows are in the order of the pages given (sorted within a directory),
+    regardless of which worker finishes first.
     """
     logging.basicConfig(level=(logging.DEBUG if debug else (logging.INFO if verbose else logging.WARNING)))
-    assignments = assignments_from_html(input)
+    files=[]
+    for path in inputs:
+        if os.path.isdir(path):
+            files.extend(os.path.join(path,name) for name in sorted(os.listdir(path))
+                if name.endswith(('.html','.htm')))
+        else:
+            files.append(path)
     writer = csv.writer(output)
-    writer.writerow(["startDate","endDate","announcementText"])
-    for assignment in assignments:
-        writer.writerow([isodate_format(assignment.available),
-            isodate_format(assignment.due),
-            "WebAssignment “%s” due %s" % (assignment.name,localdatetime_format(assignment.due))])
+    if len(inputs) == 1 and files == list(inputs):
+        rows=announcement_rows(files[0])
+        with timed('write'):
+            writer.writerow(["startDate","endDate","announcementText"])
+            writer.writerows(rows)
+        return
+    writer.writerow(["course","startDate","endDate","announcementText"])
+    job=functools.partial(profiled_call,profiler.enabled,announcement_rows)
+    with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as executor:
+        # map yields results in the order of files
+        for (path,(rows,report)) in zip(files,executor.map(job,files)):
+            if report:
+                profiler.merge(report)
+            course=os.path.splitext(os.path.basename(path))[0]
+            writer.writerows([course] + row for row in rows)
+
+
+@log_time('parse.classview')
+def announcement_rows(file):
+    "return the NYU Classes announcement CSV rows for a ClassView page"
+    return AssignmentTable.from_html(file).announcements().values.tolist()
 
 
 @click.command()
+@profile_options
 @click.argument('wagb_file',
     type=click.Path(exists=True),metavar='WEBASSIGN_GRADEBOOK_FILE')
 @click.argument('nyucgb_file',
@@ -333,9 +1134,23 @@ def assignments_from_html_to_csv(input,output,debug,verbose):
     type=click.File('w'),
     help='write to this file (use - for stdout)'
 )
+@click.option('-c','--chunksize',type=int,default=None,
+    help='stream the WebAssign GradeBook this many students at a time'
+)
+@click.option('--fuzzy',is_flag=True,default=False,
+    help='match remaining students by approximate name')
+@click.option('--cache/--no-cache',default=False,
+    help='reuse parsed input files from the on-disk parse cache')
+@click.option('--delta',type=click.Path(dir_okay=False),default=None,
+    metavar='STATE_FILE',
+    help='write only students changed since the last export recorded in this file')
+@click.option('-w','--watch',is_flag=True,default=False,
+    help='keep running, and export again whenever an input file changes')
+@click.option('--interval',type=float,default=2.0,show_default=True,
+    help='seconds between checks for changes with --watch')
 @click.option('-d','--debug',is_flag=True,default=False,help='print lots of debugging statments')
 @click.option('-v','--verbose',is_flag=True,default=False,help="Be verbose")
-def wagb_to_nyucgb(wagb_file, nyucgb_file, output, debug, verbose):
+def wagb_to_nyucgb(wagb_file, nyucgb_file, output, chunksize, fuzzy, cache, delta, watch, interval, debug, verbose):
     """Merge a WebAssign GradeBook with an NYU Classes Gradebook file
     
     The first argument is the path to a downloaded WebAssign GradeBook. 
@@ -356,14 +1171,348 @@ def wagb_to_nyucgb(wagb_file, nyucgb_file, output, debug, verbose):
     is to save to a file of the form `WebAssign_yyyy-mm-dd.csv`.  If you
     want to pipe the output, pass `-o -` on the command line.
 
-  
+    For very large (e.g., department-wide) WebAssign GradeBooks, pass
+    `--chunksize` to read the GradeBook a few thousand students at a time,
+    keeping only the students on the NYU Classes roster.
+
+    Students are matched by NetID, name, and email address.  Pass `--fuzzy`
+    to match the students left over by approximate name as well; each such
+    match is reported with its confidence.
+
+    Pass `--cache` to keep parsed input files in an on-disk cache (in
+    ~/.cache/nyucutils, or $NYUCUTILS_CACHE_DIR), so that rerunning with
+    unchanged files skips parsing them.
+
+    Pass `--delta STATE_FILE` to write only the students whose row changed
+    since the last export with the same state file (all of them the first
+    time).  The state file keeps a hash of each student's exported row.
+
+    Pass `--watch` to keep running after the export, checking the input
+    files every `--interval` seconds.  When one changes (e.g., a fresh
+    GradeBook download), only that file is reparsed and the output file is
+    written again.  Stop with Ctrl-C.
     """
     logging.basicConfig(level=(logging.DEBUG if debug else (logging.INFO if verbose else logging.WARNING)))
-    wagb=WagbParser(wagb_file).parse()
-    nyucgb=NyucgbParser(nyucgb_file).parse()
-    nyucgb2=NyucgbDecorator(nyucgb,wagb)
+    if watch:
+        watcher=GradebookWatcher(wagb_file,nyucgb_file,chunksize,fuzzy,cache)
+        (wagb,nyucgb2)=(watcher.wagb,watcher.merged)
+    else:
+        (wagb,nyucgb2)=merge_gradebooks(wagb_file,nyucgb_file,chunksize,fuzzy,cache)
     if output is None:
         output = open("WebAssign_%s.csv" % wagb.date.strftime('%Y-%m-%d'),'w')
+    export_grades(nyucgb2,output,delta)
+    if watch:
+        # re-exports replace the previous one in a regular output file,
+        # but are appended to stdout
+        rewind=(getattr(output,'name','-') not in ('-','<stdout>')
+            and os.path.isfile(output.name))
+        click.echo("Watching %s and %s for changes; press Ctrl-C to stop."
+            % (wagb_file,nyucgb_file),err=True)
+        watcher.watch(lambda: export_grades(nyucgb2,output,delta,rewind),
+            interval)
+
+
+def export_grades(nyucgb2,output,delta=None,rewind=False):
+    """write the merged gradebook `nyucgb2` to the file object `output`
+
+    With `rewind`, `output` is overwritten from the start, so that
+    exporting again replaces the previous export.  See
+    :func:`wagb_to_nyucgb` for `delta`.
+    """
+    if rewind:
+        output.seek(0)
+        output.truncate()
+    grades=nyucgb2.grades.set_index('Student ID')
+    if delta:
+        (grades,hashes)=changed_rows(grades,load_row_hashes(delta))
+    with timed('write'):
+        grades.to_csv(output)
+    output.flush()
+    if delta:
+        # only once the export is written, so failed exports are redone
+        save_row_hashes(delta,hashes)
+
+
+def row_hashes(df):
+    """return a dict mapping the index labels of `df` (as strings, for JSON)
+    to hex hashes of each row's contents"""
+    hashes=pandas.util.hash_pandas_object(df,index=False)
+    return dict(zip(df.index.astype(str),('%016x' % h for h in hashes)))
+
+def load_row_hashes(path):
+    "return the row hashes saved in `path`, or an empty dict if there are none"
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+def save_row_hashes(path,hashes):
+    "save the row hashes `hashes` in `path`"
+    with open(path,'w') as f:
+        json.dump(hashes,f,indent=0,sort_keys=True)
+
+def changed_rows(df,hashes):
+    """return the rows of `df` whose hashes aren't in `hashes`, and the
+    updated hashes
+
+    `hashes` maps index labels (e.g. Student IDs) to row hashes, as
+    returned by :func:`row_hashes`.
+    """
+    current=row_hashes(df)
+    changed=[hashes.get(label) != h for (label,h) in current.items()]
+    updated=dict(hashes)
+    updated.update(current)
+    logging.info("%d of %d rows changed",sum(changed),len(df))
+    return (df[changed],updated)
+
+
+def merge_gradebooks(wagb_file,nyucgb_file,chunksize=None,fuzzy=False,cache=False):
+    """parse a WebAssign GradeBook and an NYU Classes Gradebook file
+    and return the WebAssignGradeBook and the merged NyucgbDecorator
+
+    See :func:`wagb_to_nyucgb` for `chunksize`, `fuzzy`, and `cache`.
+    Unless streaming, the two files are read and parsed concurrently.
+    """
+    if cache:
+        parse=ParseCache().parse
+    else:
+        parse=lambda parser: parser.parse()
+    if chunksize:
+        nyucgb=parse(NyucgbParser(nyucgb_file))
+        wagb=stream_wagb(wagb_file,nyucgb.students,chunksize,fuzzy)
+    else:
+        # the parsers are given the paths, so that the WebAssign GradeBook
+        # is memory-mapped rather than read into memory (and the cache
+        # can hash the files)
+        (nyucgb,wagb)=pipeline.call_all([
+            functools.partial(parse,NyucgbParser(nyucgb_file)),
+            functools.partial(parse,WagbParser(wagb_file))])
+    return (wagb,NyucgbDecorator(nyucgb,wagb,fuzzy=fuzzy))
+
+
+def stream_wagb(wagb_file,students,chunksize,fuzzy=False):
+    """parse the WebAssign GradeBook `wagb_file` `chunksize` students at a
+    time, keeping only the rows that could match `students`
+
+    See :func:`roster_grades`.
+    """
+    parser=WagbParser(wagb_file)
+    (wagb,chunks)=parser.parse_stream(chunksize)
+    grades=roster_grades(chunks,students,fuzzy=fuzzy)
+    wagb._grades=grades.loc[:,~grades.columns.isin(parser.dropped_columns)]
+    return wagb
+
+
+def file_signature(path):
+    "return the (mtime, size) of the file at `path`, or None if it's missing"
+    try:
+        stat=os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (stat.st_mtime_ns,stat.st_size)
+
+
+def refresh(gradebook,parsed):
+    """replace the contents of `gradebook` with those of `parsed`, a fresh
+    parse of the same file, and invalidate it
+
+    Decorators of `gradebook` keep working and recompute on next use.
+    """
+    version=gradebook.version
+    gradebook.__dict__.update(parsed.__dict__)
+    gradebook.version=version
+    gradebook.invalidate()
+
+
+class GradebookWatcher(object):
+    """Keeps a merged gradebook up to date with its input files
+
+    The parsed gradebooks stay in memory.  :meth:`poll` reparses only the
+    input files whose modification time or size changed, and refreshes
+    the parsed gradebooks in place, so that ``merged`` (the
+    :class:`NyucgbDecorator`) recomputes only what depends on them.
+    See :func:`merge_gradebooks` for the other arguments.
+    """
+
+    def __init__(self,wagb_file,nyucgb_file,chunksize=None,fuzzy=False,cache=False):
+        self.wagb_file=wagb_file
+        self.nyucgb_file=nyucgb_file
+        self.chunksize=chunksize
+        self.fuzzy=fuzzy
+        if cache:
+            self.parse=ParseCache().parse
+        else:
+            self.parse=lambda parser: parser.parse()
+        self.signatures=self.stat()
+        (self.wagb,self.merged)=merge_gradebooks(wagb_file,nyucgb_file,
+            chunksize,fuzzy,cache)
+
+    def stat(self):
+        return (file_signature(self.wagb_file),file_signature(self.nyucgb_file))
+
+    def poll(self):
+        """reparse the input files changed since the last poll, and
+        return whether any was reparsed
+
+        Files missing (e.g., being replaced) are checked again next time.
+        A file that fails to parse (e.g., half-downloaded) is logged, its
+        previous parse stays in use, and it is reparsed at the next poll:
+        a file only counts as seen once it has been parsed.
+        """
+        signatures=self.stat()
+        if None in signatures:
+            return False
+        (wagb_signature,nyucgb_signature)=signatures
+        changed=False
+        if nyucgb_signature != self.signatures[1]:
+            logging.info("%s changed; reparsing it",self.nyucgb_file)
+            if self.reparse(self.merged._component,
+                    lambda: self.parse(NyucgbParser(self.nyucgb_file))):
+                self.signatures=(self.signatures[0],nyucgb_signature)
+                changed=True
+                if self.chunksize:
+                    # the rows kept depend on the roster
+                    self.signatures=(None,nyucgb_signature)
+        if wagb_signature != self.signatures[0]:
+            logging.info("reparsing %s",self.wagb_file)
+            if self.chunksize:
+                parse=lambda: stream_wagb(self.wagb_file,self.merged.students,
+                    self.chunksize,self.fuzzy)
+            else:
+                parse=lambda: self.parse(WagbParser(self.wagb_file))
+            if self.reparse(self.wagb,parse):
+                self.signatures=(wagb_signature,self.signatures[1])
+                changed=True
+        return changed
+
+    def reparse(self,gradebook,parse):
+        """refresh `gradebook` with ``parse()`` and return True, or log the
+        error and return False"""
+        try:
+            refresh(gradebook,parse())
+        except Exception as e:
+            logging.error("cannot reparse: %s: %s",type(e).__name__,e)
+            logging.debug("",exc_info=True)
+            return False
+        return True
+
+    def watch(self,callback,interval=2.0):
+        """poll every `interval` seconds and call `callback` after each
+        change, until interrupted"""
+        try:
+            while True:
+                time.sleep(interval)
+                if self.poll():
+                    callback()
+        except KeyboardInterrupt:
+            pass
+
+
+def batch_pairs(source):
+    """return a list of (WebAssign file, NYU Classes file, output file)
+    triples to merge.
+
+    `source` is either a manifest CSV file with columns "webassign",
+    "nyuclasses", and optionally "output" (relative paths are relative to
+    the manifest), or a directory with one subdirectory per section, each
+    holding one WebAssign GradeBook (``*.txt``) and one NYU Classes
+    Gradebook (``*.csv``).  A missing output means the default
+    ``WebAssign_<NYU Classes file name>_yyyy-mm-dd.csv`` next to the NYU
+    Classes file, so sections sharing a directory don't clash.
+    """
+    pairs=[]
+    if os.path.isdir(source):
+        for name in sorted(os.listdir(source)):
+            section=os.path.join(source,name)
+            if not os.path.isdir(section):
+                continue
+            files=sorted(os.listdir(section))
+            txts=[f for f in files if f.endswith('.txt')]
+            csvs=[f for f in files if f.endswith('.csv')
+                and not f.startswith('WebAssign_')]
+            if len(txts) != 1 or len(csvs) != 1:
+                logging.warning("%s: expected one .txt and one .csv file, skipping",section)
+                continue
+            pairs.append((os.path.join(section,txts[0]),
+                os.path.join(section,csvs[0]),None))
+    else:
+        root=os.path.dirname(source)
+        with open(source) as f:
+            for row in csv.DictReader(f):
+                output=row.get('output') or None
+                pairs.append(tuple(
+                    os.path.join(root,path) if path else path
+                    for path in (row['webassign'],row['nyuclasses'],output)))
+    return pairs
+
+
+def batch_job(wagb_file,nyucgb_file,output=None,chunksize=None,fuzzy=False,cache=False):
+    "merge one pair of files for :func:`wagb_to_nyucgb_batch`; return the output path"
+    (wagb,nyucgb2)=merge_gradebooks(wagb_file,nyucgb_file,chunksize,fuzzy,cache)
+    if output is None:
+        (root,name)=os.path.split(nyucgb_file)
+        output=os.path.join(root,"WebAssign_%s_%s.csv"
+            % (os.path.splitext(name)[0],wagb.date.strftime('%Y-%m-%d')))
     nyucgb2.grades.set_index('Student ID').to_csv(output)
+    return output
+
+
+@click.command()
+@profile_options
+@click.argument('source',type=click.Path(exists=True),metavar='MANIFEST_OR_DIRECTORY')
+@click.option('-j','--jobs',type=int,default=None,
+    help='number of worker processes (default: one per CPU)')
+@click.option('-c','--chunksize',type=int,default=None,
+    help='stream the WebAssign GradeBooks this many students at a time'
+)
+@click.option('--fuzzy',is_flag=True,default=False,
+    help='match remaining students by approximate name')
+@click.option('--cache/--no-cache',default=False,
+    help='reuse parsed input files from the on-disk parse cache')
+@click.option('-d','--debug',is_flag=True,default=False,help='print lots of debugging statments')
+@click.option('-v','--verbose',is_flag=True,default=False,help="Be verbose")
+def wagb_to_nyucgb_batch(source, jobs, chunksize, fuzzy, cache, debug, verbose):
+    """Merge many WebAssign GradeBooks with NYU Classes Gradebook files
+
+    SOURCE is a manifest CSV file with columns "webassign", "nyuclasses",
+    and (optionally) "output", or a directory with one subdirectory per
+    section holding its WebAssign GradeBook (.txt) and NYU Classes
+    Gradebook (.csv).  Each pair is merged as by `wa2nyuc`, in parallel
+    worker processes.  A pair that fails doesn't stop the others; a summary
+    is printed at the end, and the exit status is nonzero if any failed.
+    """
+    logging.basicConfig(level=(logging.DEBUG if debug else (logging.INFO if verbose else logging.WARNING)))
+    pairs=batch_pairs(source)
+    # pairs writing the same output would overwrite each other
+    outputs=[os.path.abspath(output) for (wagb_file,nyucgb_file,output) in pairs
+        if output]
+    clashes=set(path for path in outputs if outputs.count(path) > 1)
+    results=[]
+    with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures=[None if output and os.path.abspath(output) in clashes
+            else executor.submit(profiled_call,profiler.enabled,
+                batch_job,wagb_file,nyucgb_file,output,chunksize,fuzzy,cache)
+            for (wagb_file,nyucgb_file,output) in pairs]
+        for ((wagb_file,nyucgb_file,output),future) in zip(pairs,futures):
+            if future is None:
+                results.append((wagb_file,False,
+                    "%s is the output of more than one pair" % output))
+                continue
+            try:
+                (written,report)=future.result()
+            except Exception as e:
+                logging.debug("%s",wagb_file,exc_info=True)
+                results.append((wagb_file,False,"%s: %s" % (type(e).__name__,e)))
+                continue
+            if report:
+                profiler.merge(report)
+            results.append((wagb_file,True,written))
+    for (wagb_file,ok,message) in results:
+        click.echo("%s %s -> %s" % ('ok    ' if ok else 'FAILED',wagb_file,message))
+    failures=sum(1 for (wagb_file,ok,message) in results if not ok)
+    click.echo("%d merged, %d failed" % (len(results)-failures,failures))
+    if failures:
+        sys.exit(1)
 
 
@@ -35,10 +35,13 @@ setup(
                  'nyucutils'},
     entry_points={
         'console_scripts': [
+            'nyucutils=nyucutils.cli:main',
             'wacv2csv=nyucutils.vendors.webassign:assignments_from_html_to_csv',
             'wa2nyuc=nyucutils.vendors.webassign:wagb_to_nyucgb',
+            'wa2nyuc-batch=nyucutils.vendors.webassign:wagb_to_nyucgb_batch',
             'nyuc2gs=nyucutils.vendors.gradescope:munge',
-            'gs2nyuc=nyucutils.vendors.gradescope:gs2nyuc'
+            'gs2nyuc=nyucutils.vendors.gradescope:gs2nyuc',
+            'gs2nyuc-merge=nyucutils.vendors.gradescope:gs2nyuc_merge'
         ]
     },
     include_package_data=True,
@@ -0,0 +1,54 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+test_benchmarks
+----------------------------------
+
+Tests that the benchmark file generators write files the parsers read.
+"""
+
+import os
+import tempfile
+import unittest
+
+from benchmarks import generators
+from nyucutils.vendors import gradescope, webassign
+
+
+class TestGenerators(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def path(self, name):
+        return os.path.join(self.tmpdir.name, name)
+
+    def test_gradebooks(self):
+        generators.webassign_gradebook(self.path('wagb.txt'), 200)
+        generators.nyuclasses_gradebook(self.path('nyucgb.csv'), 200)
+        wagb = webassign.WagbParser(self.path('wagb.txt')).parse()
+        assert len(wagb.grades) == 200
+        assert 'Homework 10' in wagb.grades
+        nyucgb = webassign.NyucgbParser(self.path('nyucgb.csv')).parse()
+        matches = webassign.StudentMatcher(wagb.grades).match(nyucgb.students)
+        counts = matches['matched_on'].value_counts(dropna=False)
+        assert counts['Username'] == 158
+        assert counts['Fullname'] == 20
+        assert counts['Email'] == 20
+        assert (matches['row'] < 0).sum() == 2
+
+    def test_gradescope_scores(self):
+        generators.gradescope_scores(self.path('HW_scores.csv'), 100)
+        scores = gradescope.read_scores(self.path('HW_scores.csv'))
+        assert 80 < len(scores) <= 100
+        assert scores.between(0, 100).all()
+
+    def test_classview_page(self):
+        generators.classview_page(self.path('classview.html'), 50)
+        assignments = webassign.assignments_from_html(
+            self.path('classview.html'))
+        assert len(assignments) == 50
@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+test_cache
+----------------------------------
+
+Tests for `nyucutils.cache` module.
+"""
+
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from nyucutils.cache import ParseCache
+from nyucutils.vendors import webassign
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), 'data')
+WAGB_FILE = os.path.join(DATA_DIR, 'wagb_sample.txt')
+NYUCGB_FILE = os.path.join(DATA_DIR, 'nyucgb_sample.csv')
+
+
+class CountingWagbParser(webassign.WagbParser):
+
+    calls = 0
+
+    def parse(self):
+        CountingWagbParser.calls += 1
+        return super().parse()
+
+
+class TestParseCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.cache = ParseCache(self.tmpdir.name)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_parse(self):
+        CountingWagbParser.calls = 0
+        first = self.cache.parse(CountingWagbParser(WAGB_FILE))
+        second = self.cache.parse(CountingWagbParser(WAGB_FILE))
+        assert CountingWagbParser.calls == 1
+        assert second.grades.equals(first.grades)
+        assert second.date == first.date
+
+    def test_evict(self):
+        self.cache.parse(webassign.WagbParser(WAGB_FILE))
+        self.cache.parse(webassign.NyucgbParser(NYUCGB_FILE))
+        names = sorted(os.listdir(self.tmpdir.name))
+        assert len(names) == 2
+        # make the WebAssign entry the least recently used
+        os.utime(os.path.join(self.tmpdir.name, names[1]), (0, 0))
+        assert names[1].startswith('WagbParser')
+        self.cache.max_bytes = max(
+            os.path.getsize(os.path.join(self.tmpdir.name, name))
+            for name in names)
+        self.cache.evict()
+        assert os.listdir(self.tmpdir.name) == [names[0]]
+
+    def test_evict_concurrent(self):
+        self.cache.parse(webassign.WagbParser(WAGB_FILE))
+        self.cache.max_bytes = 0
+        # another process evicted the entry first
+        with mock.patch('os.remove', side_effect=FileNotFoundError):
+            self.cache.evict()
+
+    def test_get_stale_pickle(self):
+        os.makedirs(self.tmpdir.name, exist_ok=True)
+        with open(self.cache.path('stale'), 'wb') as f:
+            f.write(b'cnyucutils_removed_module\nGradeBook\n.')
+        assert self.cache.get('stale') is None
@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+test_gradescope
+----------------------------------
+
+Tests for `nyucutils.vendors.gradescope` module.
+"""
+
+import os
+import tempfile
+import unittest
+
+import pandas
+from click.testing import CliRunner
+
+from nyucutils.vendors import gradescope
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), 'data')
+HW1_FILE = os.path.join(DATA_DIR, 'Homework_1_scores.csv')
+HW2_FILE = os.path.join(DATA_DIR, 'Homework_2_scores.csv')
+NYUCGB_FILE = os.path.join(DATA_DIR, 'nyucgb_sample.csv')
+
+
+class TestMunge(unittest.TestCase):
+
+    def test_munge(self):
+        runner = CliRunner()
+        result = runner.invoke(gradescope.munge, [NYUCGB_FILE, NYUCGB_FILE])
+        assert result.exit_code == 0
+        assert result.output.splitlines() == [
+            'Full Name,Email,NetID',
+            'Jane Doe,jd123@nyu.edu,jd123',
+            'Richard Roe,rr456@nyu.edu,rr456',
+            'Edgar Poe,eap1@nyu.edu,eap1',
+            'Zoe Zed,zz999@nyu.edu,zz999',
+            'Ólga Othr,oother@nyu.edu,oother']
+
+    def test_munge_empty(self):
+        runner = CliRunner()
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, 'empty.csv')
+            with open(path, 'w') as f:
+                f.write('Student ID,Student Name\n')
+            result = runner.invoke(gradescope.munge, [path])
+        assert result.exit_code == 0
+        assert result.output.splitlines() == ['Full Name,Email,NetID']
+
+    def test_roster_no_commas(self):
+        students = pandas.DataFrame({'Student ID': ['ab1'],
+                                     'Student Name': ['Cher']})
+        roster = gradescope.roster_from_students(students)
+        assert list(roster['Full Name']) == ['Cher']
+
+
+class TestGs2nyucMerge(unittest.TestCase):
+
+    def test_merge(self):
+        runner = CliRunner()
+        result = runner.invoke(gradescope.gs2nyuc_merge, [HW1_FILE, HW2_FILE])
+        assert result.exit_code == 0
+        assert result.output.splitlines() == [
+            'Student ID,Homework 1,Homework 2',
+            'jd123,90.00,90.00',
+            'rr456,75.00,',
+            'eap1,,100.00',
+            'zz999,,25.00']
+
+    def test_manifest(self):
+        runner = CliRunner()
+        with tempfile.TemporaryDirectory() as tmpdir:
+            manifest = os.path.join(tmpdir, 'manifest.csv')
+            with open(manifest, 'w') as f:
+                f.write('file,max_pts\n%s,9\n' % HW1_FILE)
+            result = runner.invoke(gradescope.gs2nyuc_merge,
+                                   ['-m', manifest, HW1_FILE])
+        assert result.exit_code == 0
+        assert result.output.splitlines() == [
+            'Student ID,Homework 1',
+            'jd123,100.00',
+            'rr456,83.33']
+
+    def test_read_scores_blank_sid(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, 'Quiz_1_scores.csv')
+            with open(path, 'w') as f:
+                f.write('Name,SID,Email,Total Score,Max Points,Status\n'
+                        'Jane Doe,jd123,jd123@nyu.edu,9.0,10.0,Graded\n'
+                        'No One,,,5.0,10.0,Graded\n'
+                        'Nobody,,,6.0,10.0,Graded\n'
+                        'Jane Again,jd123,jd123@nyu.edu,8.0,10.0,Graded\n')
+            with self.assertLogs(level='WARNING') as logs:
+                scores = gradescope.read_scores(path)
+        assert list(scores.index) == ['jd123']
+        assert list(scores) == [90.0]
+        assert 'without an SID' in logs.output[0]
+        assert 'jd123' in logs.output[1]
@@ -9,13 +9,18 @@ Tests for `nyucutils` module.
 """
 
 
+import json
+import logging
+import subprocess
 import sys
 import unittest
 from contextlib import contextmanager
+import click
 from click.testing import CliRunner
 
 from nyucutils import nyucutils
 from nyucutils import cli
+from nyucutils import utils
 
 
 
@@ -32,9 +37,69 @@ class TestNyucutils(unittest.TestCase):
 
     def test_command_line_interface(self):
         runner = CliRunner()
-        result = runner.invoke(cli.main)
-        assert result.exit_code == 0
-        assert 'nyucutils.cli.main' in result.output
         help_result = runner.invoke(cli.main, ['--help'])
         assert help_result.exit_code == 0
-        assert '--help  Show this message and exit.' in help_result.output
\ No newline at end of file
+        assert '--help  Show this message and exit.' in help_result.output
+        for command in ['wacv2csv', 'wa2nyuc', 'nyuc2gs', 'gs2nyuc']:
+            assert command in help_result.output
+        help_result = runner.invoke(cli.main, ['nyuc2gs', '--help'])
+        assert help_result.exit_code == 0
+        assert 'Gradescope roster' in help_result.output
+
+    def test_lazy_imports(self):
+        code = ("import sys; from nyucutils import cli; "
+                "cli.main(['nyuc2gs', '--help'], standalone_mode=False); "
+                "print('pandas' in sys.modules)")
+        output = subprocess.check_output([sys.executable, '-c', code])
+        assert output.decode().strip().endswith('False')
+
+
+class TestLogging(unittest.TestCase):
+
+    def test_log_result_lazy(self):
+        class Result(object):
+            reprs = 0
+
+            def __repr__(self):
+                Result.reprs += 1
+                return 'Result()'
+
+        @utils.log_result
+        def f():
+            return Result()
+
+        logger = logging.getLogger('f')
+        logger.setLevel(logging.WARNING)
+        f()
+        assert Result.reprs == 0
+        logger.setLevel(logging.INFO)
+        with self.assertLogs('f', logging.INFO) as logs:
+            f()
+        assert Result.reprs == 1
+        assert logs.output == ['INFO:f:result: Result()']
+        logger.setLevel(logging.NOTSET)
+
+    def test_summarize(self):
+        import pandas
+        df = pandas.DataFrame({'a': [1.0, 2.0], 'b': [3.0, 4.0]})
+        assert utils.summarize(df) == '<DataFrame shape=(2, 2) dtypes=float64: 2>'
+        assert len(utils.summarize('x' * 1000)) == 200
+
+
+class TestProfiling(unittest.TestCase):
+
+    def test_profile_options(self):
+        @click.command()
+        @utils.profile_options
+        def command():
+            with utils.timed('write'):
+                click.echo('done')
+
+        runner = CliRunner()
+        result = runner.invoke(command, [])
+        assert result.output == 'done\n'
+        result = runner.invoke(command, ['--profile-json', '-'])
+        report = json.loads(result.output[len('done\n'):])
+        assert report['write']['calls'] == 1
+        assert set(report['total']) == set(['calls', 'wall', 'cpu'])
+        assert not utils.profiler.enabled
@@ -0,0 +1,44 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+test_pipeline
+----------------------------------
+
+Tests for `nyucutils.pipeline` module.
+"""
+
+import asyncio
+import io
+import os
+import unittest
+
+from nyucutils import pipeline
+from nyucutils.vendors import webassign
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), 'data')
+WAGB_FILE = os.path.join(DATA_DIR, 'wagb_sample.txt')
+NYUCGB_FILE = os.path.join(DATA_DIR, 'nyucgb_sample.csv')
+
+
+class TestPipeline(unittest.TestCase):
+
+    def test_load_files(self):
+        (nyucgb, wagb, name) = pipeline.load_files([
+            (NYUCGB_FILE, lambda f: webassign.NyucgbParser(f).parse()),
+            (WAGB_FILE, lambda f: webassign.WagbParser(f).parse()),
+            (WAGB_FILE, lambda f: f.name)])
+        assert wagb.grades.equals(webassign.WagbParser(WAGB_FILE).parse().grades)
+        assert list(nyucgb.students['Student ID'])[:3] == ['jd123', 'rr456', 'eap1']
+        assert name == WAGB_FILE
+
+    def test_call_all(self):
+        assert pipeline.call_all([lambda: 1, lambda: 2]) == [1, 2]
+
+    def test_running_loop(self):
+        async def main():
+            (wagb, merged) = webassign.merge_gradebooks(WAGB_FILE, NYUCGB_FILE)
+            (name,) = pipeline.load_files([(WAGB_FILE, lambda f: f.name)])
+            return (len(merged.grades), name)
+        assert asyncio.run(main()) == (5, WAGB_FILE)
+
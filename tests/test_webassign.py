@@ -0,0 +1,504 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+test_webassign
+----------------------------------
+
+Tests for `nyucutils.vendors.webassign` module.
+"""
+
+import datetime
+import gc
+import io
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+import warnings
+
+import pandas
+from click.testing import CliRunner
+
+from nyucutils.vendors import webassign
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), 'data')
+WAGB_FILE = os.path.join(DATA_DIR, 'wagb_sample.txt')
+NYUCGB_FILE = os.path.join(DATA_DIR, 'nyucgb_sample.csv')
+CLASSVIEW_FILE = os.path.join(DATA_DIR, 'classview_sample.html')
+
+
+class TestWadatetime(unittest.TestCase):
+
+    def test_wadatetime_to_datetime(self):
+        dt = webassign.wadatetime_to_datetime(' 5-2-16 05:00 PM EDT ')
+        assert dt == datetime.datetime(2016, 5, 2, 17, 0)
+        dt = webassign.wadatetime_to_datetime('12-1-16 12:30 AM EST')
+        assert dt == datetime.datetime(2016, 12, 1, 0, 30)
+
+    def test_wadatetimes_to_datetime64(self):
+        dts = webassign.wadatetimes_to_datetime64(
+            ['5-2-16 05:00 PM EDT', '12-1-16 11:59 PM EST', 'TBA'])
+        assert str(dts.dt.tz) == 'America/New_York'
+        assert dts[0] == pandas.Timestamp('2016-05-02 21:00', tz='UTC')
+        assert dts[1] == pandas.Timestamp('2016-12-02 04:59', tz='UTC')
+        assert pandas.isna(dts[2])
+
+
+class TestAssignmentsFromHtml(unittest.TestCase):
+
+    def test_assignments_from_html(self):
+        assignments = webassign.assignments_from_html(CLASSVIEW_FILE)
+        assert [a.name for a in assignments] == [
+            'Homework 1', 'Homework 2', 'Quiz 1']
+        assert assignments[0].available == datetime.datetime(
+            2017, 1, 30, 17, 0)
+        assert assignments[2].due == datetime.datetime(2017, 3, 13, 23, 59)
+
+    def test_iter_assignments_from_html(self):
+        with open(CLASSVIEW_FILE, 'rb') as f:
+            assignments = webassign.iter_assignments_from_html(f)
+            assert next(assignments).name == 'Homework 1'
+
+    def test_assignments_from_html_none_found(self):
+        page = io.BytesIO(b'<html><body><table><tr><td>x</td></tr>'
+                          b'</table></body></html>')
+        with self.assertLogs('assignments_from_html', level='WARNING'):
+            assert webassign.assignments_from_html(page) == []
+
+    def test_webassignment_slots(self):
+        assignment = webassign.WebassignMent(name='Homework 1')
+        assert not hasattr(assignment, '__dict__')
+
+    def test_assignment_table(self):
+        table = webassign.AssignmentTable.from_html(CLASSVIEW_FILE)
+        assert len(table) == 3
+        assert str(table.frame['due'].dtype).startswith('datetime64')
+        assert [a.name for a in table.due_between(end='2017-02-10')] == [
+            'Homework 1']
+        both = webassign.AssignmentTable.concat(
+            [table, table], keys=['a', 'b']).sort_by_due()
+        assert list(both.frame['course']) == ['a', 'b'] * 3
+        announcements = table.announcements()
+        assert announcements['announcementText'][0] == (
+            'WebAssignment “Homework 1” due Monday February 6 11:59PM')
+
+    def test_assignments_from_html_to_csv_directory(self):
+        runner = CliRunner()
+        with tempfile.TemporaryDirectory() as tmpdir:
+            for course in ['math-ua-121', 'math-ua-122']:
+                shutil.copy(CLASSVIEW_FILE,
+                            os.path.join(tmpdir, course + '.html'))
+            result = runner.invoke(webassign.assignments_from_html_to_csv,
+                                   [tmpdir, '-j', '2'])
+        assert result.exit_code == 0
+        lines = result.output.splitlines()
+        assert lines[0] == 'course,startDate,endDate,announcementText'
+        assert [line.split(',')[0] for line in lines[1:]] == [
+            'math-ua-121'] * 3 + ['math-ua-122'] * 3
+
+
+class TestWagbParser(unittest.TestCase):
+
+    def setUp(self):
+        self.wagb = webassign.WagbParser(WAGB_FILE).parse()
+
+    def test_metadata(self):
+        assert self.wagb.section_name == 'Calculus I, Section 001, Spring 2017'
+        assert self.wagb.instructor_name == 'Matthew Leingang'
+        assert self.wagb.date == datetime.datetime(2017, 2, 24, 10, 15)
+
+    def test_categories(self):
+        cats = self.wagb.categories.set_index('cat_name')
+        assert list(cats.index) == ['Homework', 'Quiz', 'Test', 'Final']
+        assert cats.loc['Homework', 'weight_value'] == 20
+        assert cats.loc['Homework', 'drop_count'] == 1
+
+    def test_grades(self):
+        grades = self.wagb.grades
+        assert list(grades.columns) == [
+            'Fullname', 'Username', 'Student ID', 'Email',
+            'Homework [2]', 'Quiz [1]', 'Test [1]', 'Final',
+            'Homework 1', 'Homework 2']
+        assert list(grades['Username']) == ['jd123', 'rroe2017', 'ep789', 'oo111']
+
+    def test_compact_dtypes(self):
+        grades = self.wagb.grades
+        assert grades['Username'].dtype == 'string'
+        assert grades['Final'].dtype == 'float64'
+        report = self.wagb.memory_report()
+        assert report.loc['Final', 'bytes'] == 8 * len(grades)
+        assert report.loc['Total', 'bytes'] == report['bytes'][:-1].sum()
+
+    def test_compact_dtypes_categorical(self):
+        df = pandas.DataFrame({'Section': ['001', '001', '001', '002', '002'],
+                               'Score': [1, 2, 3, 4, 5]})
+        df = webassign.compact_dtypes(df, ['Section'])
+        assert df['Section'].dtype == 'category'
+        assert df['Score'].dtype == 'int64'
+
+    def test_line_offsets(self):
+        assert webassign.line_offsets(b'a\nbc\n\nd', 5) == [2, 5, 6, 7, 7]
+
+    def test_blocks(self):
+        parser = webassign.WagbParser(WAGB_FILE)
+        with parser.blocks() as (lines, body):
+            assert len(lines) == parser.FIRST_GRADE_LINE
+            assert lines[0] == self.wagb.section_name
+            with webassign.BufferReader(body) as reader:
+                assert reader.read().decode('utf-8').startswith(
+                    'Doe, Jane\tjd123\t')
+
+    def test_parse_file_object(self):
+        with open(WAGB_FILE) as f:
+            wagb = webassign.WagbParser(f).parse()
+        assert wagb.grades.equals(self.wagb.grades)
+
+    def test_parse_stream(self):
+        parser = webassign.WagbParser(WAGB_FILE)
+        (wagb, chunks) = parser.parse_stream(chunksize=3)
+        assert wagb.date == self.wagb.date
+        chunks = list(chunks)
+        assert [len(chunk) for chunk in chunks] == [3, 1]
+        grades = pandas.concat(chunks, ignore_index=True)
+        assert grades.equals(self.wagb.grades)
+        assert parser.dropped_columns == set()
+
+    def test_parse_stream_binary(self):
+        with open(WAGB_FILE, 'rb') as f:
+            (wagb, chunks) = webassign.WagbParser(
+                io.BytesIO(f.read())).parse_stream(chunksize=3)
+        assert wagb.date == self.wagb.date
+        grades = pandas.concat(list(chunks), ignore_index=True)
+        assert grades.equals(self.wagb.grades)
+
+    def test_parse_stream_unread_closes(self):
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always', ResourceWarning)
+            (wagb, chunks) = webassign.WagbParser(WAGB_FILE).parse_stream()
+            del chunks
+            gc.collect()
+        assert not [w for w in caught
+                    if issubclass(w.category, ResourceWarning)]
+
+    def test_roster_grades(self):
+        students = webassign.NyucgbParser(NYUCGB_FILE).parse().students
+        (wagb, chunks) = webassign.WagbParser(WAGB_FILE).parse_stream(2)
+        grades = webassign.roster_grades(chunks, students)
+        assert list(grades['Username']) == ['jd123', 'rroe2017', 'ep789']
+
+    def test_roster_grades_blank_keys(self):
+        with open(WAGB_FILE) as f:
+            text = f.read()
+        text = text.replace('Doe, Jane\tjd123\t', 'Doe, Jane\t\t')
+        text = text.replace('Poe, Edgar\tep789\t', '\tep789\t')
+        for fuzzy in (False, True):
+            (wagb, merged) = webassign.merge_gradebooks(
+                io.StringIO(text), NYUCGB_FILE, chunksize=2, fuzzy=fuzzy)
+            assert 'Username' not in wagb.grades
+            assert 'Fullname' not in wagb.grades
+            df = merged.grades
+            # matched on email
+            assert list(merged.matches['row'][:2]) == [0, 1]
+            assert list(df['Final'][:2]) == [77, 56]
+
+
+class TestWagbCorrectDiagnostic(unittest.TestCase):
+
+    def setUp(self):
+        self.wagb = webassign.WagbParser(WAGB_FILE).parse()
+
+    def test_roundup(self):
+        decorator = webassign.WagbCorrectDiagnostic(self.wagb)
+        df = decorator.roundup(['Quiz [1]', 'Test [1]'],
+                               {'Quiz [1]': 0, 'Test [1]': 75})
+        assert list(df['Quiz [1]']) == [100.0, 0.0, 100.0, 100.0]
+        assert list(df['Test [1]']) == [100.0, 0.0, 100.0, 0.0]
+        assert 'Quiz [1] roundup' not in df
+
+    def test_grades_cached_and_not_mutating(self):
+        original = self.wagb.grades.copy()
+        decorator = webassign.WagbAddDatedColumn(
+            webassign.WagbCorrectDiagnostic(self.wagb))
+        df = decorator.grades
+        assert decorator.grades is df
+        assert self.wagb.grades.equals(original)
+        assert list(df['Final']) == [84.0, 56.0, 96.5, 75.0]
+
+    def test_invalidate(self):
+        diagnostic = webassign.WagbCorrectDiagnostic(self.wagb)
+        decorator = webassign.WagbAddDatedColumn(diagnostic)
+        df = decorator.grades
+        self.wagb._grades = self.wagb.grades.head(2)
+        assert decorator.grades is df
+        self.wagb.invalidate()
+        assert len(decorator.grades) == 2
+        df = decorator.grades
+        diagnostic.diagnostic_columns = []
+        diagnostic.invalidate()
+        assert list(decorator.grades['Final']) == [79.0, 56.0]
+
+    def test_recalculate(self):
+        decorator = webassign.WagbCorrectDiagnostic(self.wagb)
+        df = decorator.recalculate()
+        assert list(df['Final']) == [79.0, 56.0, 96.5, 75.0]
+
+    def test_recalculate_fractional_scores(self):
+        with open(WAGB_FILE) as f:
+            text = f.read()
+        text = text.replace('\t90\t50\t80\t', '\t91.7\t50\t83.3\t')
+        wagb = webassign.WagbParser(io.StringIO(text)).parse()
+        decorator = webassign.WagbCorrectDiagnostic(wagb)
+        df = decorator.recalculate({'Final': {'Homework [2]': 1, 'Test [1]': 3}})
+        # float32 scores would be off by about 1e-6
+        assert abs(df['Final'].iloc[0] - 85.4) < 1e-9
+
+    def test_recalculate_zero_weights(self):
+        decorator = webassign.WagbCorrectDiagnostic(self.wagb)
+        with self.assertRaisesRegex(ValueError, 'What if'):
+            decorator.recalculate({'Final': decorator.weights(),
+                                   'What if': {'Homework [2]': 0}})
+
+    def test_recalculate_schemes(self):
+        decorator = webassign.WagbCorrectDiagnostic(self.wagb)
+        df = decorator.recalculate({
+            'Final': decorator.weights(),
+            'What if': {'Homework [2]': 1, 'Test [1]': 1}})
+        assert list(df['Final']) == [79.0, 56.0, 96.5, 75.0]
+        assert list(df['What if']) == [85.0, 65.0, 97.5, 75.0]
+
+
+class TestWagbDropLowest(unittest.TestCase):
+
+    def setUp(self):
+        self.wagb = webassign.WagbParser(WAGB_FILE).parse()
+
+    def test_drop_lowest_average(self):
+        scores = [[80, 100, 90], [0, 50, float('nan')], [70, 60, 100]]
+        assert list(webassign.drop_lowest_average(scores, 1)) == [
+            95.0, 25.0, 85.0]
+        assert list(webassign.drop_lowest_average(scores, 5)) == [
+            100.0, 50.0, 100.0]
+
+    def test_grades(self):
+        decorator = webassign.WagbDropLowest(self.wagb)
+        assert decorator.assignment_columns()['Homework [2]'] == [
+            'Homework 1', 'Homework 2']
+        df = decorator.grades
+        assert list(df['Homework [2]']) == [100.0, 100.0, 100.0, 100.0]
+        assert list(df['Final']) == [81.0, 62.0, 96.5, 79.0]
+
+
+class TestNyucgbDecorator(unittest.TestCase):
+
+    def setUp(self):
+        self.wagb = webassign.WagbParser(WAGB_FILE).parse()
+        self.nyucgb = webassign.NyucgbParser(NYUCGB_FILE).parse()
+
+    def test_student_matcher(self):
+        matcher = webassign.StudentMatcher(self.wagb.grades)
+        matches = matcher.match(self.nyucgb.students)
+        assert list(matches['row']) == [0, 1, 2, -1, -1]
+        assert list(matches['matched_on'][:3]) == [
+            'Username', 'Fullname', 'Fullname']
+        assert matches['matched_on'].isna().tolist() == [
+            False, False, False, True, True]
+
+    def test_grades(self):
+        decorator = webassign.NyucgbDecorator(self.nyucgb, self.wagb)
+        df = decorator.grades
+        assert list(df['Student ID']) == [
+            'jd123', 'rr456', 'eap1', 'zz999', 'oother']
+        assert list(df['Username'][:3]) == ['jd123', 'rroe2017', 'ep789']
+        assert df['Final'].isna().tolist() == [False, False, False, True, True]
+        assert 'WebAssign Student ID' in df
+        assert df['Student ID'].dtype == 'string'
+        assert df['Final'].dtype == 'float64'
+
+    def test_normalize_name(self):
+        assert webassign.normalize_name('Othér,  Ólga') == ('other', 'olga')
+        assert webassign.normalize_name('Ólga Othér') == ('other', 'olga')
+        assert webassign.normalize_name('Cher') == ('cher', '')
+
+    def test_grades_fuzzy(self):
+        decorator = webassign.NyucgbDecorator(self.nyucgb, self.wagb,
+                                              fuzzy=True)
+        df = decorator.grades
+        assert df['Username'].iloc[4] == 'oo111'
+        assert pandas.isna(df['Username'].iloc[3])
+        matches = decorator.matches
+        assert matches['matched_on'].iloc[4] == 'fuzzy'
+        assert 0.9 < matches['confidence'].iloc[4] < 1
+        assert pandas.isna(matches['confidence'].iloc[3])
+
+    def test_grades_fuzzy_one_to_one(self):
+        nyucgb = webassign.NyuClassesGradebook()
+        nyucgb._grades = pandas.DataFrame({
+            'Student ID': ['x1', 'x2'],
+            'Student Name': ['Othr, Olga', 'Other, Olgaa']})
+        decorator = webassign.NyucgbDecorator(nyucgb, self.wagb, fuzzy=True)
+        with self.assertLogs(level='WARNING') as logs:
+            df = decorator.grades
+        assert list(decorator.matches['row']) == [-1, 3]
+        assert df['Username'].isna().tolist() == [True, False]
+        assert any('left unmatched' in line for line in logs.output)
+
+
+class TestWagbToNyucgbBatch(unittest.TestCase):
+
+    def test_manifest(self):
+        runner = CliRunner()
+        with tempfile.TemporaryDirectory() as tmpdir:
+            manifest = os.path.join(tmpdir, 'manifest.csv')
+            with open(manifest, 'w') as f:
+                f.write('webassign,nyuclasses,output\n')
+                f.write('%s,%s,one.csv\n' % (WAGB_FILE, NYUCGB_FILE))
+                f.write('missing.txt,%s,two.csv\n' % NYUCGB_FILE)
+            result = runner.invoke(webassign.wagb_to_nyucgb_batch,
+                                   [manifest, '-j', '2'])
+            assert result.exit_code == 1
+            assert '1 merged, 1 failed' in result.output
+            assert 'missing.txt' in result.output
+            merged = pandas.read_csv(os.path.join(tmpdir, 'one.csv'))
+            assert len(merged) == 5
+
+    def test_profile_workers(self):
+        runner = CliRunner()
+        with tempfile.TemporaryDirectory() as tmpdir:
+            manifest = os.path.join(tmpdir, 'manifest.csv')
+            with open(manifest, 'w') as f:
+                f.write('webassign,nyuclasses,output\n')
+                f.write('%s,%s,one.csv\n' % (WAGB_FILE, NYUCGB_FILE))
+            report = os.path.join(tmpdir, 'profile.json')
+            result = runner.invoke(webassign.wagb_to_nyucgb_batch,
+                                   [manifest, '--profile-json', report])
+            assert result.exit_code == 0
+            with open(report) as f:
+                stages = json.load(f)
+        assert stages['parse.webassign']['calls'] == 1
+        assert stages['match']['calls'] == 1
+
+    def test_manifest_outputs_unique(self):
+        runner = CliRunner()
+        with tempfile.TemporaryDirectory() as tmpdir:
+            for section in ['001', '002']:
+                shutil.copy(NYUCGB_FILE, os.path.join(tmpdir, section + '.csv'))
+            manifest = os.path.join(tmpdir, 'manifest.csv')
+            with open(manifest, 'w') as f:
+                f.write('webassign,nyuclasses,output\n')
+                f.write('%s,001.csv,\n' % WAGB_FILE)
+                f.write('%s,002.csv,\n' % WAGB_FILE)
+                f.write('%s,001.csv,same.csv\n' % WAGB_FILE)
+                f.write('%s,002.csv,same.csv\n' % WAGB_FILE)
+            result = runner.invoke(webassign.wagb_to_nyucgb_batch,
+                                   [manifest, '-j', '2'])
+            assert result.exit_code == 1
+            assert '2 merged, 2 failed' in result.output
+            assert 'more than one pair' in result.output
+            assert sorted(name for name in os.listdir(tmpdir)
+                          if name.startswith('WebAssign_')) == [
+                'WebAssign_001_2017-02-24.csv', 'WebAssign_002_2017-02-24.csv']
+            assert not os.path.exists(os.path.join(tmpdir, 'same.csv'))
+
+
+class TestDeltaExport(unittest.TestCase):
+
+    def test_changed_rows(self):
+        df = pandas.DataFrame({'Final': [80.0, 90.0]}, index=['ab1', 'cd2'])
+        (changed, hashes) = webassign.changed_rows(df, {})
+        assert list(changed.index) == ['ab1', 'cd2']
+        df.loc['cd2', 'Final'] = 95.0
+        df.loc['ef3'] = 70.0
+        (changed, hashes) = webassign.changed_rows(df, hashes)
+        assert list(changed.index) == ['cd2', 'ef3']
+        (changed, hashes) = webassign.changed_rows(df, hashes)
+        assert changed.empty
+
+    def test_wagb_to_nyucgb_delta(self):
+        runner = CliRunner()
+        with tempfile.TemporaryDirectory() as tmpdir:
+            state = os.path.join(tmpdir, 'state.json')
+            args = [WAGB_FILE, NYUCGB_FILE, '-o', '-', '--delta', state]
+            result = runner.invoke(webassign.wagb_to_nyucgb, args)
+            assert len(result.output.splitlines()) == 6
+            result = runner.invoke(webassign.wagb_to_nyucgb, args)
+            assert len(result.output.splitlines()) == 1
+
+    def test_export_failure_keeps_state(self):
+        class BrokenFile(io.StringIO):
+            def write(self, text):
+                raise OSError("disk full")
+        (wagb, merged) = webassign.merge_gradebooks(WAGB_FILE, NYUCGB_FILE)
+        with tempfile.TemporaryDirectory() as tmpdir:
+            state = os.path.join(tmpdir, 'state.json')
+            with self.assertRaises(OSError):
+                webassign.export_grades(merged, BrokenFile(), state)
+            assert not os.path.exists(state)
+
+    def test_wagb_to_nyucgb_append_stdout(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, 'out.csv')
+            with open(path, 'w') as f:
+                f.write('earlier\n')
+            with open(path, 'a') as f:
+                subprocess.check_call(
+                    [sys.executable, '-m', 'nyucutils.cli', 'wa2nyuc',
+                     WAGB_FILE, NYUCGB_FILE, '-o', '-'],
+                    stdout=f, stderr=subprocess.DEVNULL)
+            with open(path) as f:
+                lines = f.read().splitlines()
+            assert lines[0] == 'earlier'
+            assert lines[1].startswith('Student ID,')
+            assert len(lines) == 7
+
+
+class TestGradebookWatcher(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.wagb_file = shutil.copy(WAGB_FILE, self.tmpdir.name)
+        self.nyucgb_file = shutil.copy(NYUCGB_FILE, self.tmpdir.name)
+        self.watcher = webassign.GradebookWatcher(self.wagb_file,
+                                                  self.nyucgb_file)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_poll(self):
+        merged = self.watcher.merged
+        nyucgb = merged._component
+        assert merged.grades['Final'].iloc[0] == 77
+        assert not self.watcher.poll()
+        with open(self.wagb_file) as f:
+            text = f.read()
+        with open(self.wagb_file, 'w') as f:
+            f.write(text.replace('\t77\t', '\t88\t'))
+        os.utime(self.wagb_file, ns=(0, 0))
+        assert self.watcher.poll()
+        assert merged.grades['Final'].iloc[0] == 88
+        # the NYU Classes gradebook wasn't reparsed
+        assert merged._component is nyucgb
+        assert nyucgb.version == 0
+        assert not self.watcher.poll()
+
+    def test_poll_failed_reparse(self):
+        merged = self.watcher.merged
+        with open(self.wagb_file) as f:
+            text = f.read()
+        with open(self.wagb_file, 'w') as f:
+            f.write(text.replace('\t77\t', '\t88\t'))
+        with open(self.nyucgb_file, 'w') as f:
+            f.write('"unterminated\n')
+        os.utime(self.wagb_file, ns=(0, 0))
+        with self.assertLogs(level='ERROR'):
+            assert self.watcher.poll()
+        assert merged.grades['Final'].iloc[0] == 88
+        # the NYU Classes gradebook is retried until it parses
+        with self.assertLogs(level='ERROR'):
+            assert not self.watcher.poll()
+        shutil.copy(NYUCGB_FILE, self.nyucgb_file)
+        assert self.watcher.poll()
+        assert not self.watcher.poll()